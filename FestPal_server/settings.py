@@ -46,6 +46,7 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
+    'backend.middleware.TokenAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -104,3 +105,95 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/1.8/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# FestPal API
+
+# Maximum number of IDs accepted by the batch read endpoints
+FESTPAL_MAX_BATCH_SIZE = 100
+
+# Maximum number of festivals returned by the leaderboard
+FESTPAL_LEADERBOARD_SIZE = 100
+
+# Deletions are kept for the sync endpoint for this many seconds, pruned by manage.py prune_tombstones.
+# Clients with a sync token older than that are answered 'Incorrect input' and have to do a full sync
+FESTPAL_TOMBSTONE_RETENTION = 2592000
+
+# Maximum number of concerts accepted by the bulk lineup upload
+FESTPAL_MAX_BULK_SIZE = 1000
+
+# Permission flags of clients are cached per process for this many seconds, for up to this many clients
+FESTPAL_CLIENT_CACHE_TTL = 60
+FESTPAL_CLIENT_CACHE_SIZE = 1000
+
+# Buffer votes and write them in batches, every FESTPAL_VOTE_BUFFER_INTERVAL seconds or once
+# FESTPAL_VOTE_BUFFER_SIZE votes are waiting. With a FESTPAL_VOTE_BUFFER_PATH, waiting votes are
+# also kept in a file per process, that path suffixed with the pid, and written when the server
+# restarts after a crash
+FESTPAL_VOTE_BUFFER = False
+FESTPAL_VOTE_BUFFER_INTERVAL = 5
+FESTPAL_VOTE_BUFFER_SIZE = 500
+FESTPAL_VOTE_BUFFER_PATH = None
+
+# Downloads of festivals are recorded off the request path, in batches written every
+# FESTPAL_DOWNLOAD_BUFFER_INTERVAL seconds or once FESTPAL_DOWNLOAD_BUFFER_SIZE downloads are waiting
+FESTPAL_DOWNLOAD_BUFFER_INTERVAL = 30
+FESTPAL_DOWNLOAD_BUFFER_SIZE = 500
+FESTPAL_DOWNLOAD_BUFFER_PATH = None
+
+# Serialized festival and lineup responses are cached in a small LRU of each process, for up to
+# FESTPAL_RESPONSE_CACHE_LOCAL_SIZE responses, FESTPAL_RESPONSE_CACHE_LOCAL_MAX_BYTES bytes in total
+# and FESTPAL_RESPONSE_CACHE_LOCAL_TTL seconds, in front of
+# the 'festpal' cache shared by all processes, for up to FESTPAL_RESPONSE_CACHE_SIZE responses.
+# Responses over FESTPAL_RESPONSE_CACHE_MAX_BYTES are not cached. Writes to a festival reach the
+# other processes within FESTPAL_RESPONSE_CACHE_VERSION_TTL seconds
+FESTPAL_RESPONSE_CACHE = 'festpal'
+FESTPAL_RESPONSE_CACHE_SIZE = 10000
+FESTPAL_RESPONSE_CACHE_LOCAL_SIZE = 200
+FESTPAL_RESPONSE_CACHE_LOCAL_TTL = 60
+FESTPAL_RESPONSE_CACHE_LOCAL_MAX_BYTES = 16777216
+FESTPAL_RESPONSE_CACHE_VERSION_TTL = 1
+FESTPAL_RESPONSE_CACHE_MAX_BYTES = 1048576
+
+# The file-based 'festpal' cache stands in for a shared cache such as memcached on a single host.
+# Its files are unpickled when read, so FESTPAL_CACHE_DIR has to be writable by the server's user only;
+# the cache creates the directories with mode 0700
+FESTPAL_CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'festpal': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(FESTPAL_CACHE_DIR, 'festpal'),
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': FESTPAL_RESPONSE_CACHE_SIZE,
+        },
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(FESTPAL_CACHE_DIR, 'sessions'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+# Where the sessions of logged in users are kept, read on every request to the API:
+# 'db' reads them from the database, 'cached_db' from the 'sessions' cache with the database as a fallback,
+# 'cache' from the 'sessions' cache only (sessions are lost if evicted), 'signed_cookies' from the
+# client's cookie (sessions can not be revoked server-side). manage.py benchmark_sessions compares them
+FESTPAL_SESSION_STORE = 'cached_db'
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + FESTPAL_SESSION_STORE
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Access tokens issued by log_in on request are valid for FESTPAL_TOKEN_LIFETIME seconds, and carry the
+# permissions of the user when they were issued. The versions used to revoke them are cached for
+# FESTPAL_TOKEN_VERSION_TTL seconds in the FESTPAL_TOKEN_CACHE cache. With several API nodes, that cache
+# has to be shared by them (e.g. memcached), or a revoked token is accepted by the other nodes for up to
+# FESTPAL_TOKEN_VERSION_TTL seconds; manage.py check --deploy warns about a cache local to a host
+FESTPAL_TOKEN_LIFETIME = 86400
+FESTPAL_TOKEN_VERSION_TTL = 5
+FESTPAL_TOKEN_CACHE = 'festpal'
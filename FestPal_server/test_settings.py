@@ -0,0 +1,10 @@
+"""
+Settings for running the tests, e.g. python manage.py test --settings=FestPal_server.test_settings
+
+Tests get caches of their own, rather than the files shared with the server
+"""
+
+from .settings import *  # noqa: F401,F403
+
+CACHES = dict((alias, {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias})
+              for alias in CACHES)  # noqa: F405
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "FestPal_server.settings")
 
 application = get_wsgi_application()
+
+from backend.buffers import start_buffers  # noqa: E402
+
+start_buffers()
@@ -1,12 +1,18 @@
 from django.contrib import admin
 
-from .models import Client, Concert, Festival, Profile
+from . import response_cache
+from .models import Client, Concert, Festival, Profile, client_permissions
 
 
 class ClientAdmin(admin.ModelAdmin):
     fields = ['name', 'read_access', 'write_access', 'delete_access', 'vote_access']
     list_display = ('name', 'read_access', 'write_access', 'delete_access', 'vote_access')
 
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['permission_cache'] = client_permissions.stats()
+        return super(ClientAdmin, self).changelist_view(request, extra_context)
+
 
 class ConcertAdmin(admin.ModelAdmin):
     readonly_fields = ('last_modified', 'first_uploaded')
@@ -19,15 +25,28 @@ class ConcertAdmin(admin.ModelAdmin):
 
 
 class FestivalAdmin(admin.ModelAdmin):
-    readonly_fields = ('last_modified', 'first_uploaded')
+    readonly_fields = ('last_modified', 'first_uploaded', 'vote_count', 'download_count')
     fieldsets = [
         (None, {'fields': ['name', 'description', 'genre', 'prices']}),
         ('Location', {'fields': ['country', 'city', 'address']}),
-        ('Upload/download info', {'fields': ['uploader', 'official', 'downloads', 'voters']}),
+        ('Upload/download info', {'fields': ['uploader', 'official', 'downloads', 'voters',
+                                             'download_count', 'vote_count']}),
         ('Modification info', {'fields': ['first_uploaded', 'last_modified']}),
     ]
     list_display = ('name', 'official', 'country', 'city', 'last_modified')
 
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super(FestivalAdmin, self).save_model(request, obj, form, change)
+        # The counters loaded with the form may be stale by now: leave them to F() updates, see Festival.COUNTERS
+        obj.save(update_fields=[field.name for field in obj._meta.concrete_fields
+                                if not field.primary_key and field.name not in Festival.COUNTERS.values()])
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['response_cache'] = response_cache.stats()
+        return super(FestivalAdmin, self).changelist_view(request, extra_context)
+
 
 class ProfileAdmin(admin.ModelAdmin):
     fields = ['user', 'representative', 'country', 'city']
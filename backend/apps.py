@@ -0,0 +1,19 @@
+from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_migrate
+
+
+# noinspection PyUnusedLocal
+def create_search_index(sender, using='default', **kwargs):
+    from .search import create_search_index
+    create_search_index(using)
+
+
+class BackendConfig(AppConfig):
+    name = 'backend'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .checks import check_token_cache
+        checks.register(check_token_cache, checks.Tags.security, deploy=True)
+        post_migrate.connect(create_search_index, sender=self)
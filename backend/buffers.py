@@ -0,0 +1,318 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import atexit
+import glob
+import logging
+import os
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction, connections, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Festival
+from .response_cache import invalidate_festival
+
+logger = logging.getLogger(__name__)
+
+
+def _process_alive(pid):
+    """
+    Check whether a process is running, on POSIX systems
+    :param pid: process id
+    :return: True if the process exists
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PairBuffer:
+    """
+    Collects (festival pk, user pk) pairs off the request path and writes them in batches.
+    Pairs are de-duplicated in memory and, if a journal path is given, appended to a local file
+    so that the pairs not written yet are replayed after a crash. Each process keeps its own journal,
+    the path suffixed with its pid, so that the workers of a server do not overwrite each other's pairs.
+    Batches are written by a background thread every interval seconds, or as soon as max_size pairs are waiting.
+    Threads do not survive a fork, so a worker forked from the process that started the buffer starts its own
+    """
+    def __init__(self, write, max_size=500, interval=5, path=None):
+        """
+        :param write: function writing a set of pairs to the database
+        :param max_size: number of pending pairs that triggers a write
+        :param interval: seconds between writes of the background thread
+        :param path: path of the journal files, None to keep the pairs in memory only
+        """
+        self.write = write
+        self.max_size = max_size
+        self.interval = interval
+        self.path = path
+        self._pairs = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def add(self, festival_id, user_id):
+        """
+        Queue a pair to be written
+        :param festival_id: primary key of the festival
+        :param user_id: primary key of the user
+        """
+        pair = (int(festival_id), int(user_id))
+        if self._pid is not None and self._pid != os.getpid():
+            self._restart()
+        with self._lock:
+            if pair in self._pairs:
+                return
+            self._pairs.add(pair)
+            if self.path is not None:
+                with open(self._journal_path(), 'a') as journal:
+                    journal.write('{0} {1}\n'.format(*pair))
+            full = len(self._pairs) >= self.max_size
+        if full:
+            if self._thread is not None:
+                self._wake.set()
+            else:
+                self.flush()
+
+    def clear(self):
+        """
+        Drop the pending pairs without writing them
+        """
+        with self._lock:
+            self._pairs = set()
+            self._save_journal()
+
+    def flush(self):
+        """
+        Write the pending pairs. If writing fails, they are kept for the next flush
+        :return: number of pairs written
+        """
+        with self._flush_lock:
+            with self._lock:
+                pairs, self._pairs = self._pairs, set()
+            if not pairs:
+                return 0
+            try:
+                self.write(pairs)
+            except Exception:
+                with self._lock:
+                    self._pairs |= pairs
+                raise
+            with self._lock:
+                self._save_journal()
+            return len(pairs)
+
+    def _journal_path(self):
+        # The pid is read on every use, as the buffers are created before a server forks its workers
+        return '{0}.{1}'.format(self.path, os.getpid())
+
+    def replay(self):
+        """
+        Queue again the pairs of the journals left by processes that are no longer running,
+        or by a previous process with the same pid. A journal is claimed by renaming it, so
+        that when several workers start at once, each journal is replayed by only one of them
+        """
+        if self.path is None:
+            return
+        pid = os.getpid()
+        with self._lock:
+            for path in glob.glob(glob.escape(self.path) + '.*'):
+                # Journals are named path.pid, and claimed ones path.pid-previous pid
+                owner = path[len(self.path) + 1:].split('-')[0]
+                if not owner.isdigit() or (int(owner) != pid and _process_alive(int(owner))):
+                    continue
+                if path == self._journal_path():
+                    claimed = path
+                else:
+                    claimed = '{0}-{1}'.format(self._journal_path(), path[len(self.path) + 1:].replace('-', '_'))
+                    try:
+                        os.rename(path, claimed)
+                    except FileNotFoundError:
+                        # Claimed by another worker
+                        continue
+                with open(claimed) as journal:
+                    for line in journal:
+                        values = line.split()
+                        # The last line may be incomplete if the process died while writing it
+                        if len(values) == 2 and values[0].isdigit() and values[1].isdigit():
+                            self._pairs.add((int(values[0]), int(values[1])))
+                if claimed != path:
+                    # Keep the pairs in this process's journal before letting go of the claimed one
+                    self._save_journal()
+                    os.remove(claimed)
+
+    def _save_journal(self):
+        # Called with the lock held: keep only the pairs added since the flush started
+        if self.path is None:
+            return
+        path = self._journal_path()
+        with open(path + '.tmp', 'w') as journal:
+            journal.writelines('{0} {1}\n'.format(*pair) for pair in self._pairs)
+        os.replace(path + '.tmp', path)
+
+    def start(self):
+        """
+        Replay the journal and start the background thread writing the pairs.
+        The pending pairs are written on interpreter exit, see stop()
+        """
+        if self._thread is not None:
+            return
+        self._pid = os.getpid()
+        self.replay()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='PairBuffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _restart(self):
+        # In a process forked after start(), e.g. a worker of a server loading the application before forking.
+        # The pending pairs are the parent's, in its journal, and its locks may have been held by its thread
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._forget_parent()
+            self.start()
+
+    def _forget_parent(self):
+        self._pairs = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def stop(self):
+        """
+        Stop the background thread and write the pending pairs
+        """
+        if self._pid is not None and self._pid != os.getpid():
+            # Forked from the process that started the buffer, and never used: its pairs are the parent's
+            self._forget_parent()
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        connections.close_all()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Writing buffered pairs failed, retrying at the next flush')
+            finally:
+                # Connections are per thread; do not keep one open between flushes
+                connections.close_all()
+
+
+# Number of users of a festival looked up in one query by write_festival_users()
+_LOOKUP_BATCH_SIZE = 500
+
+
+def write_festival_users(field_name, touch=True):
+    """
+    Build the write function of a PairBuffer for a many-to-many relation from Festival to User,
+    which also raises the counter of the relation, see Festival.COUNTERS
+    :param field_name: name of the many-to-many field, e.g. 'voters'
+    :param touch: whether to update last_modified of the festivals along with their counters
+    :return: function writing a set of (festival pk, user pk) pairs
+    """
+    counter_name = Festival.COUNTERS[field_name]
+
+    def write(pairs):
+        field = Festival._meta.get_field(field_name)
+        through = getattr(Festival, field_name).through
+        festival_column = through._meta.get_field(field.m2m_field_name()).attname
+        user_column = through._meta.get_field(field.m2m_reverse_field_name()).attname
+        users_by_festival = {}
+        for festival, user in pairs:
+            users_by_festival.setdefault(festival, []).append(user)
+        with transaction.atomic():
+            # Per festival, and in batches within the limit of query parameters of SQLite
+            existing = set()
+            for festival, users in users_by_festival.items():
+                for start in range(0, len(users), _LOOKUP_BATCH_SIZE):
+                    existing.update(through.objects.filter(**{
+                        festival_column: festival,
+                        user_column + '__in': users[start:start + _LOOKUP_BATCH_SIZE],
+                    }).values_list(festival_column, user_column))
+            new = [pair for pair in pairs if pair not in existing]
+            try:
+                with transaction.atomic():
+                    through.objects.bulk_create([through(**{festival_column: festival, user_column: user})
+                                                 for festival, user in new])
+            except IntegrityError:
+                # Some pairs were written concurrently by another process: write them one at a time
+                inserted = []
+                for festival, user in new:
+                    try:
+                        with transaction.atomic():
+                            through.objects.create(**{festival_column: festival, user_column: user})
+                        inserted.append((festival, user))
+                    except IntegrityError:
+                        pass
+                new = inserted
+            # Festivals deleted in the meantime have no row left to count on
+            counts = Counter(festival for festival, user in new)
+            for festival, count in counts.items():
+                values = {counter_name: F(counter_name) + count}
+                if touch:
+                    values['last_modified'] = timezone.now()
+                Festival.objects.filter(pk=festival).update(**values)
+        for festival in counts:
+            invalidate_festival(festival)
+    return write
+
+
+vote_buffer = PairBuffer(write_festival_users('voters'),
+                         getattr(settings, 'FESTPAL_VOTE_BUFFER_SIZE', 500),
+                         getattr(settings, 'FESTPAL_VOTE_BUFFER_INTERVAL', 5),
+                         getattr(settings, 'FESTPAL_VOTE_BUFFER_PATH', None))
+
+# Downloads do not touch last_modified, which would invalidate the cached copies of popular festivals
+# after every flush; the download count is part of their ETag instead, see backend.conditional
+download_buffer = PairBuffer(write_festival_users('downloads', touch=False),
+                             getattr(settings, 'FESTPAL_DOWNLOAD_BUFFER_SIZE', 500),
+                             getattr(settings, 'FESTPAL_DOWNLOAD_BUFFER_INTERVAL', 30),
+                             getattr(settings, 'FESTPAL_DOWNLOAD_BUFFER_PATH', None))
+
+
+def start_buffers():
+    """
+    Start the buffers enabled in the settings, to be called once per process serving requests
+    """
+    if getattr(settings, 'FESTPAL_VOTE_BUFFER', False):
+        vote_buffer.start()
+    download_buffer.start()
@@ -0,0 +1,203 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+def byte_size(value):
+    """
+    :param value: string or bytes
+    :return: number of bytes of the value, strings being counted encoded as UTF-8
+    """
+    return len(value.encode('utf-8')) if isinstance(value, str) else len(value)
+
+
+class LRUCache:
+    """
+    Process-local cache keeping at most max_size entries, and if max_bytes is given at most that
+    many bytes of values, evicting the least recently used first. Entries expire ttl seconds
+    after being set. Safe to share between threads
+    """
+    def __init__(self, max_size=1000, ttl=None, max_bytes=None):
+        """
+        :param max_size: maximum number of entries
+        :param ttl: time to live of the entries in seconds, None for no expiry
+        :param max_bytes: maximum total size of the values in bytes, see byte_size(), None for no limit
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        :param key: key of the entry
+        :param default: value returned if the entry is missing or expired
+        :return: value of the entry, or default
+        """
+        with self._lock:
+            value, expires, size = self._entries.get(key, (_MISSING, None, 0))
+            if value is not _MISSING and expires is not None and expires <= time.monotonic():
+                self._remove(key)
+                value = _MISSING
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _remove(self, key):
+        # Called with the lock held
+        value, expires, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def set(self, key, value):
+        # Measured once, on set, as encoding a string to count its bytes is not free
+        size = byte_size(value) if self.max_bytes is not None else 0
+        if self.max_size <= 0 or (self.max_bytes is not None and size > self.max_bytes):
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires, size)
+            self._bytes += size
+            while len(self._entries) > self.max_size or (self.max_bytes is not None and
+                                                         self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        :return: dictionary of the hits, misses, hit rate (None before any lookup), size and maximum size
+        """
+        lookups = self.hits + self.misses
+        return OrderedDict([
+            ('hits', self.hits),
+            ('misses', self.misses),
+            ('hit_rate', self.hits / lookups if lookups else None),
+            ('size', len(self._entries)),
+            ('max_size', self.max_size),
+        ])
+
+
+class TwoTierCache:
+    """
+    Small process-local LRUCache (L1) in front of a cache shared by all processes (L2).
+    Keys belong to namespaces with a version kept in L2: bumping the version of a namespace
+    makes its keys unreachable in both tiers of every process. Each process reuses the version
+    it read for up to version_ttl seconds, so most reads do not need L2 at all
+    """
+    def __init__(self, alias, max_size=200, ttl=60, version_ttl=1, max_bytes=None):
+        """
+        :param alias: alias of the shared cache in CACHES
+        :param max_size: maximum number of entries kept in L1
+        :param ttl: time to live of the entries in L1 in seconds
+        :param version_ttl: seconds a process reuses the version of a namespace before reading it again
+        :param max_bytes: maximum total length of the values kept in L1, None for no limit
+        """
+        self.alias = alias
+        self.local = LRUCache(max_size, ttl, max_bytes)
+        self.versions = LRUCache(max_size, version_ttl)
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _version_key(namespace):
+        return 'version:' + namespace
+
+    def version(self, namespace):
+        version = self.versions.get(namespace)
+        if version is None:
+            version = self.shared.get(self._version_key(namespace), 0)
+            self.versions.set(namespace, version)
+        return version
+
+    def bump_version(self, namespace):
+        """
+        Invalidate all the keys of a namespace
+        :param namespace: namespace of the keys
+        """
+        try:
+            version = self.shared.incr(self._version_key(namespace))
+        except ValueError:
+            # Not set yet, or evicted: start from a version that was not used before
+            version = int(time.time() * 1000)
+            self.shared.set(self._version_key(namespace), version, None)
+        self.versions.set(namespace, version)
+
+    def _full_key(self, namespace, key):
+        return '{0}:{1}:{2}'.format(namespace, self.version(namespace), key)
+
+    def get(self, namespace, key):
+        """
+        :param namespace: namespace of the key
+        :param key: key of the entry within the namespace
+        :return: value of the entry, or None if it is not cached in either tier
+        """
+        full_key = self._full_key(namespace, key)
+        value = self.local.get(full_key)
+        if value is not None:
+            return value
+        value = self.shared.get(full_key)
+        if value is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        self.local.set(full_key, value)
+        return value
+
+    def set(self, namespace, key, value):
+        full_key = self._full_key(namespace, key)
+        self.local.set(full_key, value)
+        self.shared.set(full_key, value)
+
+    def stats(self):
+        """
+        :return: dictionary of the hits in L1, hits in L2, misses and hit rate (None before any lookup)
+        """
+        lookups = self.local.hits + self.local.misses
+        return OrderedDict([
+            ('local_hits', self.local.hits),
+            ('shared_hits', self.shared_hits),
+            ('misses', self.shared_misses),
+            ('hit_rate', (self.local.hits + self.shared_hits) / lookups if lookups else None),
+        ])
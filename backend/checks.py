@@ -0,0 +1,37 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from django.conf import settings
+from django.core.checks import Warning
+
+# Cache backends keeping their entries in a single process or on a single host
+_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',
+                 'django.core.cache.backends.filebased.FileBasedCache',
+                 'django.core.cache.backends.dummy.DummyCache')
+
+
+# noinspection PyUnusedLocal
+def check_token_cache(app_configs, **kwargs):
+    """
+    Warn if the revocation versions of access tokens are cached where other API nodes can not see them
+    :param app_configs: checked applications, unused
+    :return: list of warnings
+    """
+    alias = getattr(settings, 'FESTPAL_TOKEN_CACHE', 'default')
+    if settings.CACHES[alias]['BACKEND'] not in _LOCAL_CACHES:
+        return []
+    return [Warning("FESTPAL_TOKEN_CACHE '{0}' is not shared between hosts".format(alias),
+                    hint='Revoked access tokens are accepted by the other API nodes for up to '
+                         'FESTPAL_TOKEN_VERSION_TTL seconds. Use a cache such as memcached.',
+                    id='backend.W001')]
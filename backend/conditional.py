@@ -0,0 +1,117 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import calendar
+import hashlib
+
+from django.db.models import Max, Count
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+from .models import Festival, Concert
+
+
+class Validators:
+    """
+    ETag and Last-Modified of a resource, computed without fetching the resource itself
+    """
+    def __init__(self, last_modified, *parts):
+        self.last_modified = last_modified
+        digest = hashlib.md5(':'.join(str(part) for part in (last_modified,) + parts).encode('utf-8'))
+        self.etag = '"{0}"'.format(digest.hexdigest())
+
+    def last_modified_timestamp(self):
+        return calendar.timegm(self.last_modified.utctimetuple())
+
+    def not_modified(self, request):
+        """
+        Check the conditional headers of a request against the validators. As in RFC 7232,
+        If-Modified-Since is ignored when If-None-Match is present
+        :param request: HttpRequest
+        :return: True if the client's copy is current
+        """
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            etags = [etag.strip() for etag in if_none_match.split(',')]
+            etags = [etag[2:] if etag.startswith('W/') else etag for etag in etags]
+            return '*' in etags or self.etag in etags
+        if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since is not None:
+            if_modified_since = parse_http_date_safe(if_modified_since)
+            return if_modified_since is not None and self.last_modified_timestamp() <= if_modified_since
+        return False
+
+    def apply(self, response):
+        """
+        Set the ETag and Last-Modified headers of a response
+        :param response: HttpResponse
+        :return: the response
+        """
+        response['ETag'] = self.etag
+        response['Last-Modified'] = http_date(self.last_modified_timestamp())
+        return response
+
+    def not_modified_response(self):
+        return self.apply(HttpResponseNotModified())
+
+
+def festival_validators(pk, *parts):
+    """
+    Compute the validators of a festival's information with a single-row query
+    :param pk: primary key of the festival
+    :param parts: further values the representation depends on, e.g. the fields requested
+    :return: Validators, or None if the festival does not exist
+    """
+    rows = list(Festival.objects.filter(pk=pk).values_list('last_modified', 'download_count'))
+    if not rows:
+        return None
+    # Recording downloads does not touch last_modified, see backend.buffers
+    last_modified, download_count = rows[0]
+    return Validators(last_modified, 'festival', pk, download_count, *parts)
+
+
+def lineup_validators(festival_pk, *parts, downloads=False):
+    """
+    Compute the validators of a festival's lineup from the latest modification of its concerts,
+    with a single aggregate query. Deleting a concert touches its festival, see backend.signals
+    :param festival_pk: primary key of the festival
+    :param parts: further values the representation depends on, e.g. the fields requested
+    :param downloads: whether the representation includes the number of downloads of the festival
+    :return: Validators, or None if the festival does not exist
+    """
+    rows = list(Festival.objects.filter(pk=festival_pk)
+                .annotate(lineup_modified=Max('concert__last_modified'), lineup_size=Count('concert'))
+                .values_list('last_modified', 'download_count', 'lineup_modified', 'lineup_size'))
+    if not rows:
+        return None
+    festival_modified, download_count, lineup_modified, lineup_size = rows[0]
+    if lineup_modified is None or lineup_modified < festival_modified:
+        lineup_modified = festival_modified
+    if downloads:
+        # Recording downloads does not touch last_modified, see backend.buffers
+        parts = (download_count,) + parts
+    return Validators(lineup_modified, 'lineup', festival_pk, lineup_size, *parts)
+
+
+def concert_validators(pk, *parts):
+    """
+    Compute the validators of a concert's information with a single-row query
+    :param pk: primary key of the concert
+    :param parts: further values the representation depends on, e.g. the fields requested
+    :return: Validators, or None if the concert does not exist
+    """
+    rows = list(Concert.objects.filter(pk=pk).values_list('last_modified'))
+    if not rows:
+        return None
+    return Validators(rows[0][0], 'concert', pk, *parts)
@@ -0,0 +1,64 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from django.db.models import Q
+
+from .models import Festival, PriceTier, Concert
+from .search import search_festivals
+
+SUBSTRING_FILTERS = ('name', 'country', 'city', 'genre')
+
+
+def filter_festivals(festivals, params):
+    """
+    Narrow down a Festival queryset by the filters present in a request's parameters,
+    so that all of them are evaluated by the database in a single query
+    :param festivals: Festival queryset to filter
+    :param params: QueryDict (or dict) with the request parameters
+    :return: filtered queryset
+    """
+    if 'official' in params.keys():
+        festivals = festivals.filter(official=bool(params['official']))
+    for field in SUBSTRING_FILTERS:
+        if field in params.keys():
+            festivals = festivals.filter(**{field + '__contains': params[field]})
+    if 'min_price' in params.keys() or 'max_price' in params.keys():
+        festivals = filter_price_range(festivals, params.get('min_price'), params.get('max_price'))
+    if 'artist' in params.keys():
+        concerts = Concert.objects.filter(artist__contains=params['artist'])
+        festivals = festivals.filter(pk__in=concerts.values('festival'))
+    if 'search' in params.keys():
+        festivals = search_festivals(festivals, params['search'])
+    return festivals
+
+
+def filter_price_range(festivals, min_price=None, max_price=None):
+    """
+    Keep only the festivals with at least one price tier strictly within the range given.
+    Festivals without prices are treated as free of charge in any currency
+    :param festivals: Festival queryset to filter
+    :param min_price: lower bound of the range, e.g. '20e', or None
+    :param max_price: upper bound of the range, e.g. '60e', or None
+    :return: filtered queryset
+    """
+    min_price_formatted, max_price_formatted = Festival.parse_price_bounds(min_price, max_price)
+    tiers = PriceTier.objects.all()
+    if min_price_formatted:
+        tiers = tiers.filter(currency=min_price_formatted[1], amount__gt=min_price_formatted[0])
+    if max_price_formatted:
+        tiers = tiers.filter(currency=max_price_formatted[1], amount__lt=max_price_formatted[0])
+    in_range = Q(pk__in=tiers.values('festival'))
+    if not min_price_formatted or min_price_formatted[0] == 0:
+        in_range |= Q(prices='')
+    return festivals.filter(in_range)
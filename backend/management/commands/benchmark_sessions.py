@@ -0,0 +1,77 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import time
+from collections import OrderedDict
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from backend.models import Client as ApiClient
+
+SESSION_STORES = OrderedDict([
+    ('db', 'django.contrib.sessions.backends.db'),
+    ('cached_db', 'django.contrib.sessions.backends.cached_db'),
+    ('cache', 'django.contrib.sessions.backends.cache'),
+    ('signed_cookies', 'django.contrib.sessions.backends.signed_cookies'),
+])
+
+
+class Command(BaseCommand):
+    help = ('Measure the queries and time per request of a login_required endpoint with each session store, '
+            'see FESTPAL_SESSION_STORE. The user and client it needs, and their sessions, are deleted at the end')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='number of requests per session store')
+        parser.add_argument('--path', default='/backend/mult/fest/', help='login_required endpoint to request')
+
+    def handle(self, *args, **options):
+        session_table = connection.ops.quote_name(Session._meta.db_table)
+        user_table = connection.ops.quote_name(User._meta.db_table)
+        client_table = connection.ops.quote_name(ApiClient._meta.db_table)
+        self.stdout.write('{0:<16}{1:>10}{2:>10}{3:>10}{4:>10}{5:>10}'.format('store', 'queries', 'session', 'user',
+                                                                              'client', 'ms'))
+        # Not in a transaction: client_has_permission() does not cache the permissions of a client inside one
+        User.objects.create_user('benchmark_sessions', password='benchmark_sessions')
+        try:
+            for store, engine in SESSION_STORES.items():
+                with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=['testserver']):
+                    client = Client()
+                    client.login(username='benchmark_sessions', password='benchmark_sessions')
+                    try:
+                        # The first request registers the API client and fills the caches
+                        client.post(options['path'], {'client': 'benchmark_sessions'})
+                        started = time.time()
+                        with CaptureQueriesContext(connection) as queries:
+                            for request in range(options['requests']):
+                                client.post(options['path'], {'client': 'benchmark_sessions'})
+                        elapsed = time.time() - started
+                    finally:
+                        # Deletes the session from the store, which for 'cache' is the shared 'sessions' cache
+                        client.logout()
+                sqls = [query['sql'] for query in queries.captured_queries]
+                self.stdout.write('{0:<16}{1:>10.2f}{2:>10.2f}{3:>10.2f}{4:>10.2f}{5:>10.2f}'.format(
+                    store,
+                    len(sqls) / options['requests'],
+                    len([sql for sql in sqls if session_table in sql]) / options['requests'],
+                    len([sql for sql in sqls if user_table in sql]) / options['requests'],
+                    len([sql for sql in sqls if client_table in sql]) / options['requests'],
+                    elapsed * 1000 / options['requests']))
+        finally:
+            ApiClient.objects.filter(name='benchmark_sessions').delete()
+            User.objects.filter(username='benchmark_sessions').delete()
@@ -0,0 +1,146 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.models import Festival, Concert
+from backend.pagination import paginate, iterate_in_chunks
+
+# Exported files, with the model of their rows; votes and downloads are the rows of the many-to-many tables
+EXPORTS = OrderedDict([
+    ('festivals', Festival),
+    ('concerts', Concert),
+    ('votes', Festival.voters.through),
+    ('downloads', Festival.downloads.through),
+])
+
+
+def _export_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+class Command(BaseCommand):
+    help = ('Export festivals, concerts, votes and downloads to one CSV or JSON Lines file each, '
+            'reading the tables in chunks of primary keys so that memory use does not grow with their size')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='directory to write the files to')
+        parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl', help='format of the files')
+        parser.add_argument('--gzip', action='store_true', default=False, help='compress the files with gzip')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='number of rows read per query')
+        parser.add_argument('--only', nargs='+', choices=tuple(EXPORTS.keys()), help='export only these files')
+        parser.add_argument('--resume', action='store_true', default=False,
+                            help='append to the files of an interrupted export, after the last pk exported')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('The chunk size should be positive')
+        if not os.path.isdir(options['directory']):
+            raise CommandError('Directory {0} does not exist'.format(options['directory']))
+        for name in options['only'] or EXPORTS.keys():
+            path = os.path.join(options['directory'], '{0}.{1}'.format(name, options['format']))
+            if options['gzip']:
+                path += '.gz'
+            self.export(name, EXPORTS[name], path, options)
+
+    def export(self, name, model, path, options):
+        """
+        Export the rows of a model in pk order, one chunk at a time. The progress file is created with the
+        file, and after each chunk the last pk and the size of the file are saved to it; it is removed once
+        the export completes.
+        When compressing, each chunk is a separate gzip member, so a file cut after any chunk is valid
+        :param name: name of the export, for the report
+        :param model: model whose rows are exported
+        :param path: path of the file to write
+        :param options: options of the command
+        """
+        progress_path = path + '.progress'
+        last_pk = None
+        if options['resume'] and os.path.exists(progress_path):
+            with open(progress_path) as progress:
+                last_pk, offset = [int(value) for value in progress.read().split()]
+            if offset == 0:
+                # Interrupted before anything was written
+                last_pk = None
+        elif options['resume'] and os.path.exists(path):
+            self.stdout.write('{0} already exported, skipping'.format(name))
+            return
+
+        columns = [field.attname for field in model._meta.concrete_fields]
+        queryset = model.objects.all()
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+
+        started = time.time()
+        exported = 0
+        if last_pk is None:
+            # Recorded before the file is created, so that a file without progress is always a complete export
+            self.save_progress(progress_path, 0, 0)
+        with open(path, 'wb' if last_pk is None else 'r+b') as destination:
+            if last_pk is None:
+                if options['format'] == 'csv':
+                    self.write_chunk(destination, [columns], columns, options)
+                self.save_progress(progress_path, 0, destination.tell())
+            else:
+                # Drop whatever was written after the last chunk recorded
+                destination.truncate(offset)
+                destination.seek(offset)
+            rows = []
+            for record in iterate_in_chunks(paginate(queryset, 'id'), 'id', chunk_size=options['chunk_size']):
+                rows.append([_export_value(getattr(record, column)) for column in columns])
+                if len(rows) == options['chunk_size']:
+                    self.write_chunk(destination, rows, columns, options)
+                    self.save_progress(progress_path, record.pk, destination.tell())
+                    exported += len(rows)
+                    rows = []
+            self.write_chunk(destination, rows, columns, options)
+            exported += len(rows)
+
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        elapsed = time.time() - started
+        self.stdout.write('Exported {0} {1} in {2:.1f}s ({3:.0f} rows/s)'.format(
+            exported, name, elapsed, exported / elapsed if elapsed else 0))
+
+    @staticmethod
+    def write_chunk(destination, rows, columns, options):
+        if not rows:
+            return
+        text = io.StringIO(newline='')
+        if options['format'] == 'csv':
+            csv.writer(text).writerows(rows)
+        else:
+            for row in rows:
+                text.write(json.dumps(OrderedDict(zip(columns, row))) + '\n')
+        data = text.getvalue().encode('utf-8')
+        if options['gzip']:
+            data = gzip.compress(data)
+        destination.write(data)
+        destination.flush()
+
+    @staticmethod
+    def save_progress(progress_path, pk, offset):
+        with open(progress_path, 'w') as progress:
+            progress.write('{0} {1}'.format(pk, offset))
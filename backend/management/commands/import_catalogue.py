@@ -0,0 +1,178 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import csv
+import itertools
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from backend.models import Festival, Concert, PriceTier
+from backend.search import create_search_index
+from backend.validation import clean_festival, clean_concert
+
+
+def read_records(path, file_format):
+    """
+    Read the records of a CSV or JSON Lines file one at a time, without loading the whole file
+    :param path: path of the file
+    :param file_format: 'csv' or 'jsonl'
+    :return: generator of dictionaries, with None for the lines that can not be parsed
+    """
+    with open(path, encoding='utf-8', newline='') as source:
+        if file_format == 'csv':
+            for row in csv.DictReader(source):
+                # Empty cells stand for fields that are not given
+                yield dict((key, value) for key, value in row.items() if key is not None and value != '')
+        else:
+            for line in source:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    yield None
+                    continue
+                yield record if isinstance(record, dict) else None
+
+
+def batches(records, size):
+    """
+    :param records: iterable of records
+    :param size: maximum number of records in a batch
+    :return: generator of lists of records
+    """
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Import festivals and concerts from CSV or JSON Lines files. Concerts refer to their festival by name. '
+            'Records that are invalid or whose festival name or artist exists already are skipped')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--festivals', help='file of festivals to import')
+        parser.add_argument('--concerts', help='file of concerts to import, imported after the festivals')
+        parser.add_argument('--owner', help='username of the uploader of the imported festivals')
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help='format of the files, guessed from their extension by default')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='number of records inserted per query and transaction')
+
+    def handle(self, *args, **options):
+        if not options['festivals'] and not options['concerts']:
+            raise CommandError('Nothing to import, give --festivals and/or --concerts')
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size should be positive')
+        self.verbosity = options['verbosity']
+        self.batch_size = options['batch_size']
+        # Festival name -> pk, filled as festivals are imported or referenced by concerts
+        self.festival_pks = {}
+
+        if options['festivals']:
+            if not options['owner']:
+                raise CommandError('Give the --owner of the imported festivals')
+            try:
+                owner = User.objects.get(username=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError('User {0} does not exist'.format(options['owner']))
+            path = options['festivals']
+            self.import_file('festivals', self.import_festivals,
+                             read_records(path, self.file_format(path, options['format'])), owner)
+            # bulk_create sends no post_save signals, so the full-text index is filled here
+            create_search_index()
+        if options['concerts']:
+            path = options['concerts']
+            self.import_file('concerts', self.import_concerts,
+                             read_records(path, self.file_format(path, options['format'])))
+
+    @staticmethod
+    def file_format(path, file_format):
+        if file_format is not None:
+            return file_format
+        for extension in ('csv', 'jsonl'):
+            if path.lower().endswith('.' + extension):
+                return extension
+        raise CommandError('Can not guess the format of {0}, give --format'.format(path))
+
+    def import_file(self, name, import_batch, records, *args):
+        """
+        Import records batch by batch and report the throughput
+        :param name: name of the records, for the report
+        :param import_batch: function importing a batch, returning the number of records inserted
+        :param records: iterable of records
+        :param args: further arguments of import_batch
+        """
+        started = time.time()
+        read = inserted = 0
+        for batch in batches(records, self.batch_size):
+            read += len(batch)
+            inserted += import_batch(batch, *args)
+            if self.verbosity >= 2:
+                self.stdout.write('{0}: {1} read, {2} inserted'.format(name, read, inserted))
+        elapsed = time.time() - started
+        self.stdout.write('Imported {0} {1}, skipped {2}, in {3:.1f}s ({4:.0f} records/s)'.format(
+            inserted, name, read - inserted, elapsed, read / elapsed if elapsed else 0))
+
+    def import_festivals(self, batch, owner):
+        values = [clean_festival(record) for record in batch if record is not None]
+        names = [festival['name'] for festival in values if festival is not None]
+        taken = set(Festival.objects.filter(name__in=names).values_list('name', flat=True))
+        festivals = []
+        for festival in values:
+            if festival is None or festival['name'] in taken:
+                continue
+            taken.add(festival['name'])
+            festivals.append(Festival(owner=owner, **festival))
+        with transaction.atomic():
+            Festival.objects.bulk_create(festivals)
+            # bulk_create does not set the primary keys, so they are read back by name
+            self.festival_pks.update(Festival.objects.filter(name__in=[festival.name for festival in festivals])
+                                     .values_list('name', 'pk'))
+            tiers = []
+            for festival in festivals:
+                festival.pk = self.festival_pks[festival.name]
+                tiers.extend(festival.price_tiers())
+            PriceTier.objects.bulk_create(tiers)
+        return len(festivals)
+
+    def import_concerts(self, batch):
+        values = []
+        for record in batch:
+            if record is None or 'festival' not in record:
+                continue
+            concert = clean_concert(record)
+            if concert is not None:
+                values.append((str(record['festival']), concert))
+        unknown = set(festival for festival, concert in values if festival not in self.festival_pks)
+        if unknown:
+            self.festival_pks.update(Festival.objects.filter(name__in=unknown).values_list('name', 'pk'))
+        artists = [concert['artist'] for festival, concert in values]
+        taken = set(Concert.objects.filter(artist__in=artists).values_list('artist', flat=True))
+        concerts = []
+        for festival, concert in values:
+            if festival not in self.festival_pks or concert['artist'] in taken:
+                continue
+            taken.add(concert['artist'])
+            concerts.append(Concert(festival_id=self.festival_pks[festival], **concert))
+        with transaction.atomic():
+            Concert.objects.bulk_create(concerts)
+        return len(concerts)
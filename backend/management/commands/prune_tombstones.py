@@ -0,0 +1,32 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from django.core.management.base import BaseCommand
+
+from backend.models import Tombstone
+from backend.sync import tombstone_cutoff
+
+
+class Command(BaseCommand):
+    help = ('Delete the records of deleted festivals and concerts older than FESTPAL_TOMBSTONE_RETENTION, '
+            'which the sync endpoint no longer accepts tokens for. Meant to be run periodically, e.g. from cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='database to prune the tombstones of')
+
+    def handle(self, *args, **options):
+        tombstones = Tombstone.objects.using(options['database']).filter(deleted__lt=tombstone_cutoff())
+        pruned = tombstones.count()
+        tombstones.delete()
+        self.stdout.write('Pruned {0} tombstones'.format(pruned))
@@ -0,0 +1,36 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.models import Festival
+
+
+class Command(BaseCommand):
+    help = ('Recompute the vote and download counts of all festivals the leaderboard is ranked by, '
+            'e.g. after importing votes or downloads directly into the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='database to rebuild the leaderboard of')
+
+    def handle(self, *args, **options):
+        started = time.time()
+        with transaction.atomic(using=options['database']):
+            for field_name in sorted(Festival.COUNTERS):
+                Festival.recount(field_name, using=options['database'])
+        self.stdout.write('Recounted {0} festivals in {1:.1f}s'.format(
+            Festival.objects.using(options['database']).count(), time.time() - started))
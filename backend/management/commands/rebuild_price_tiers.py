@@ -0,0 +1,59 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from backend.models import Festival, PriceTier
+from backend.pagination import paginate, iterate_in_chunks
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the price tiers the price range filter searches from the prices of all festivals, '
+            'e.g. for festivals stored before price tiers were, reading them in chunks of primary keys')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='number of festivals per transaction')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('The chunk size should be positive')
+        started = time.time()
+        festivals = paginate(Festival.objects.only('pk', 'prices'), 'id')
+        chunk = []
+        rebuilt = 0
+        for festival in iterate_in_chunks(festivals, 'id', chunk_size=options['chunk_size']):
+            chunk.append(festival)
+            if len(chunk) == options['chunk_size']:
+                rebuilt += self.rebuild(chunk)
+                chunk = []
+        rebuilt += self.rebuild(chunk)
+        self.stdout.write('Rebuilt the price tiers of {0} festivals in {1:.1f}s'.format(
+            rebuilt, time.time() - started))
+
+    @staticmethod
+    def rebuild(festivals):
+        """
+        Replace the price tiers of some festivals with the ones parsed from their prices, in one transaction
+        :param festivals: list of Festival objects
+        :return: number of festivals
+        """
+        if not festivals:
+            return 0
+        with transaction.atomic():
+            PriceTier.objects.filter(festival__in=[festival.pk for festival in festivals]).delete()
+            PriceTier.objects.bulk_create([tier for festival in festivals for tier in festival.price_tiers()])
+        return len(festivals)
@@ -0,0 +1,33 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from .tokens import user_from_token
+
+
+class TokenAuthenticationMiddleware(object):
+    """
+    Authenticate requests carrying an "Authorization: Bearer <token>" header with a token issued by log_in(),
+    without a session or a query for the user. To be placed after AuthenticationMiddleware
+    """
+    def process_request(self, request):
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not header.startswith('Bearer '):
+            return None
+        user = user_from_token(header[len('Bearer '):].strip())
+        if user is not None:
+            request.user = user
+            request.auth_token = True
+            # Browsers do not add the header to cross-site requests on their own, so there is no request to forge
+            request._dont_enforce_csrf_checks = True
+        return None
@@ -14,15 +14,20 @@
 
 import re
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction, connections
 from django.contrib.auth.models import User
 
+from .caching import LRUCache
+
 
 class Profile(models.Model):
     user = models.OneToOneField(User)
     representative = models.BooleanField(default=False)
     country = models.CharField(max_length=50, blank=True)
     city = models.CharField(max_length=90, blank=True)
+    # Raised to revoke the access tokens issued to the user, see backend.tokens
+    token_version = models.PositiveIntegerField(default=0)
 
 
 class Client(models.Model):
@@ -35,6 +40,13 @@ class Client(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        client = super(Client, cls).from_db(db, field_names, values)
+        # Name the client was read with, whose cached permissions are to be dropped if it is renamed
+        client.loaded_name = client.name
+        return client
+
 
 class Festival(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -48,8 +60,16 @@ class Festival(models.Model):
     official = models.BooleanField(default=False)
     downloads = models.ManyToManyField(User, related_name='+', blank=True)
     voters = models.ManyToManyField(User, related_name='+', blank=True)
-    first_uploaded = models.DateTimeField('first_uploaded', auto_now_add=True)
-    last_modified = models.DateTimeField('last_uploaded', auto_now=True)
+    # Numbers of voters and downloads, kept in step with them by backend.buffers, vote() and backend.signals
+    vote_count = models.PositiveIntegerField(default=0, db_index=True)
+    download_count = models.PositiveIntegerField(default=0, db_index=True)
+    first_uploaded = models.DateTimeField('first_uploaded', auto_now_add=True, db_index=True)
+    last_modified = models.DateTimeField('last_uploaded', auto_now=True, db_index=True)
+
+    class Meta:
+        # Rankings of the leaderboard, overall and within a country or a genre
+        index_together = [('country', 'vote_count'), ('genre', 'vote_count'),
+                          ('country', 'download_count'), ('genre', 'download_count')]
 
     def __str__(self):
         return self.name
@@ -57,31 +77,36 @@ class Festival(models.Model):
     def voters_number(self):
         return self.voters.all().count()
 
+    # Many-to-many fields and the columns counting them
+    COUNTERS = {'voters': 'vote_count', 'downloads': 'download_count'}
+
+    @classmethod
+    def recount(cls, field_name, pks=None, using='default'):
+        """
+        Recompute the counter of a many-to-many field of festivals, with a single UPDATE
+        :param field_name: 'voters' or 'downloads'
+        :param pks: primary keys of the festivals to recount, None for all festivals
+        :param using: database alias
+        """
+        field = cls._meta.get_field(field_name)
+        sql = 'UPDATE {0} SET {1} = (SELECT COUNT(*) FROM {2} WHERE {2}.{3} = {0}.{4})'.format(
+            cls._meta.db_table, cls._meta.get_field(cls.COUNTERS[field_name]).column, field.m2m_db_table(),
+            field.m2m_column_name(), cls._meta.pk.column)
+        params = []
+        if pks is not None:
+            pks = list(pks)
+            if not pks:
+                return
+            sql += ' WHERE {0} IN ({1})'.format(cls._meta.pk.column, ', '.join(['%s'] * len(pks)))
+            params = pks
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, params)
+
     def downloads_number(self):
         return self.downloads.all().count()
 
     def price_is_in_range(self, min_price=None, max_price=None):
-        if min_price is None and max_price is None:
-            raise ValueError("Either min_price or max_price should be defined")
-        min_price_formatted = []
-        if min_price is not None:
-            min_price_formatted = self._separate_value_from_currency(min_price)
-            if min_price_formatted is []:
-                raise InvalidInputOrDifferentCurrencyError('Invalid min_price.')
-            if min_price_formatted[0] < 0:
-                raise InvalidInputOrDifferentCurrencyError('Negative min_price.')
-        max_price_formatted = []
-        if max_price is not None:
-            max_price_formatted = self._separate_value_from_currency(max_price)
-            if max_price_formatted is []:
-                raise InvalidInputOrDifferentCurrencyError('Invalid max_price')
-            if max_price_formatted[0] < 0:
-                raise InvalidInputOrDifferentCurrencyError('Negative max_price')
-        if min_price_formatted != [] and max_price_formatted != []:
-            if min_price_formatted[1] != max_price_formatted[1]:
-                raise InvalidInputOrDifferentCurrencyError('min_price and max_price currency mismatch')
-            if min_price_formatted[0] > max_price_formatted[0]:
-                raise InvalidInputOrDifferentCurrencyError('min_price higher than max_price')
+        min_price_formatted, max_price_formatted = self.parse_price_bounds(min_price, max_price)
         if self.prices == '':
             if min_price is not None:
                 if min_price_formatted[0] > 0:
@@ -109,6 +134,61 @@ class Festival(models.Model):
                     return True
         return False
 
+    def price_tiers(self):
+        """
+        Parse the prices string of the festival into PriceTier objects (not saved).
+        Prices that can not be parsed are skipped
+        :return: list of PriceTier objects
+        """
+        tiers = []
+        currency_length = PriceTier._meta.get_field('currency').max_length
+        for price in self.prices.split(" "):
+            price_formatted = self._separate_value_from_currency(price)
+            if price_formatted and len(price_formatted[1]) <= currency_length:
+                tiers.append(PriceTier(festival=self, amount=price_formatted[0], currency=price_formatted[1]))
+        return tiers
+
+    def update_price_tiers(self, using='default'):
+        """
+        Replace the stored price tiers of the festival with the ones parsed from its prices string,
+        in a transaction so that the festival is never seen without tiers
+        :param using: database alias
+        """
+        with transaction.atomic(using=using):
+            PriceTier.objects.using(using).filter(festival=self).delete()
+            PriceTier.objects.using(using).bulk_create(self.price_tiers())
+
+    @classmethod
+    def parse_price_bounds(cls, min_price=None, max_price=None):
+        """
+        Parse and validate the bounds of a price range
+        :param min_price: lower bound of the range, e.g. '20e', or None
+        :param max_price: upper bound of the range, e.g. '60e', or None
+        :return: [value, currency] for each bound, [] for a bound that is not defined
+        """
+        if min_price is None and max_price is None:
+            raise ValueError("Either min_price or max_price should be defined")
+        min_price_formatted = []
+        if min_price is not None:
+            min_price_formatted = cls._separate_value_from_currency(min_price)
+            if not min_price_formatted:
+                raise InvalidInputOrDifferentCurrencyError('Invalid min_price.')
+            if min_price_formatted[0] < 0:
+                raise InvalidInputOrDifferentCurrencyError('Negative min_price.')
+        max_price_formatted = []
+        if max_price is not None:
+            max_price_formatted = cls._separate_value_from_currency(max_price)
+            if not max_price_formatted:
+                raise InvalidInputOrDifferentCurrencyError('Invalid max_price')
+            if max_price_formatted[0] < 0:
+                raise InvalidInputOrDifferentCurrencyError('Negative max_price')
+        if min_price_formatted != [] and max_price_formatted != []:
+            if min_price_formatted[1] != max_price_formatted[1]:
+                raise InvalidInputOrDifferentCurrencyError('min_price and max_price currency mismatch')
+            if min_price_formatted[0] > max_price_formatted[0]:
+                raise InvalidInputOrDifferentCurrencyError('min_price higher than max_price')
+        return min_price_formatted, max_price_formatted
+
     @staticmethod
     def _separate_value_from_currency(price):
         value_str = re.findall("[+-]?\d+", price)
@@ -126,6 +206,18 @@ class InvalidInputOrDifferentCurrencyError(Exception):
     pass
 
 
+class PriceTier(models.Model):
+    festival = models.ForeignKey(Festival)
+    amount = models.IntegerField()
+    currency = models.CharField(max_length=20)
+
+    class Meta:
+        index_together = [('currency', 'amount')]
+
+    def __str__(self):
+        return '{0}{1}'.format(self.amount, self.currency)
+
+
 class Concert(models.Model):
     festival = models.ForeignKey(Festival)
     artist = models.CharField(max_length=255, unique=True)
@@ -134,16 +226,31 @@ class Concert(models.Model):
     start = models.DateTimeField()
     end = models.DateTimeField()
     first_uploaded = models.DateTimeField(auto_now_add=True)
-    last_modified = models.DateTimeField(auto_now=True)
+    last_modified = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.artist
 
 
+class Tombstone(models.Model):
+    model = models.CharField(max_length=30)
+    object_id = models.IntegerField()
+    deleted = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return '{0} {1}'.format(self.model, self.object_id)
+
+
+# Permission flags of clients by name. Saving or deleting a client clears it (see backend.signals),
+# other processes see the change once their entries expire
+client_permissions = LRUCache(getattr(settings, 'FESTPAL_CLIENT_CACHE_SIZE', 1000),
+                              getattr(settings, 'FESTPAL_CLIENT_CACHE_TTL', 60))
+
+
 def client_has_permission(name, permission):
     """
     Query clients in database for a client name, create new one if necessary,
-    and return whether the permission requested is granted
+    and return whether the permission requested is granted. The flags are cached per process
     :param name: name of the client
     :param permission: permission type requested (read, write, delete or vote)
     :return: True if client has permission, False otherwise
@@ -152,17 +259,19 @@ def client_has_permission(name, permission):
             and permission != 'delete' and permission != 'vote':
         raise InvalidPermissionStringError('Permission %s not recognised! Acceptable values:'
                                            'read, write, error, vote', name)
-    if Client.objects.filter(name=name).count() == 0:
-        Client.objects.create(name=name)
-    client = Client.objects.get(name=name)
-    if permission == 'read':
-        return client.read_access
-    elif permission == 'write':
-        return client.write_access
-    elif permission == 'delete':
-        return client.delete_access
-    elif permission == 'vote':
-        return client.vote_access
+    permissions = client_permissions.get(name)
+    if permissions is None:
+        # A single query for known clients. Unknown ones are inserted in a savepoint, and if a concurrent
+        # request inserted the same name first, the IntegrityError is caught and that client is read instead
+        client = Client.objects.get_or_create(name=name)[0]
+        permissions = {'read': client.read_access,
+                       'write': client.write_access,
+                       'delete': client.delete_access,
+                       'vote': client.vote_access}
+        # A client read or created inside a transaction could still be rolled back
+        if not transaction.get_connection().in_atomic_block:
+            client_permissions.set(name, permissions)
+    return permissions[permission]
 
 
 class InvalidPermissionStringError(Exception):
@@ -0,0 +1,159 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import datetime
+
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+SORT_KEYS = ('id', 'name', 'first_uploaded', 'last_modified')
+
+CHUNK_SIZE = 100
+
+_CURSOR_SALT = 'backend.pagination.cursor'
+
+_SEARCH_CURSOR_SALT = 'backend.pagination.search_cursor'
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+def _parse_order(order):
+    """
+    Split an order parameter into the field to sort on and the direction
+    :param order: one of SORT_KEYS, optionally prefixed with '-' for descending order
+    :return: (field name, descending)
+    """
+    descending = order.startswith('-')
+    key = order.lstrip('-')
+    if key not in SORT_KEYS:
+        raise InvalidCursorError('Order %s not recognised' % order)
+    return key, descending
+
+
+def paginate(queryset, order='id', cursor=None):
+    """
+    Order a queryset by (order, pk) and, if a cursor is given, keep only the records after it.
+    The records are found with an indexed range condition, so deep pages cost as much as the first
+    :param queryset: queryset to paginate
+    :param order: one of SORT_KEYS, optionally prefixed with '-' for descending order
+    :param cursor: cursor returned by next_cursor() for the previous page
+    :return: ordered queryset, to be sliced to the page size
+    """
+    key, descending = _parse_order(order)
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(prefix + key, prefix + 'pk')
+    if cursor is None:
+        return queryset
+
+    try:
+        cursor_order, value, pk = signing.loads(cursor, salt=_CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise InvalidCursorError('Cursor not recognised')
+    if cursor_order != order:
+        raise InvalidCursorError('Cursor does not match order %s' % order)
+    if key in ('first_uploaded', 'last_modified'):
+        value = parse_datetime(value)
+    return _after(queryset, key, descending, value, pk)
+
+
+def _after(queryset, key, descending, value, pk):
+    lookup = '__lt' if descending else '__gt'
+    return queryset.filter(Q(**{key + lookup: value}) | Q(**{key: value, 'pk' + lookup: pk}))
+
+
+def next_cursor(queryset, order, num):
+    """
+    Build the opaque cursor pointing after a page, without fetching the page itself
+    :param queryset: queryset returned by paginate()
+    :param order: order the queryset was paginated with
+    :param num: page size
+    :return: cursor string, or None if the page is not full
+    """
+    key = _parse_order(order)[0]
+    if num == 0:
+        return None
+    boundary = list(queryset.values_list(key, 'pk')[num - 1:num])
+    if not boundary:
+        return None
+    value, pk = boundary[0]
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    return signing.dumps([order, value, pk], salt=_CURSOR_SALT)
+
+
+def paginate_search(queryset, query, cursor=None):
+    """
+    Order search results by relevance and find where the page given by a cursor starts.
+    The rank of a result depends on the query and has no index to seek in, so unlike the cursors
+    of paginate(), search cursors hold an offset
+    :param queryset: queryset returned by search_festivals()
+    :param query: search query the queryset was filtered with
+    :param cursor: cursor returned by next_search_cursor() for the previous page
+    :return: (ordered queryset, offset of the page)
+    """
+    queryset = queryset.order_by('-search_rank', 'pk')
+    if cursor is None:
+        return queryset, 0
+
+    try:
+        cursor_query, offset = signing.loads(cursor, salt=_SEARCH_CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise InvalidCursorError('Cursor not recognised')
+    if cursor_query != query:
+        raise InvalidCursorError('Cursor does not match search %s' % query)
+    return queryset, offset
+
+
+def next_search_cursor(queryset, query, offset, num):
+    """
+    Build the cursor pointing after a page of search results, without fetching the page itself
+    :param queryset: queryset returned by paginate_search()
+    :param query: search query the queryset was filtered with
+    :param offset: offset of the page
+    :param num: page size
+    :return: cursor string, or None if the page is not full
+    """
+    if num == 0 or not list(queryset.values_list('pk', flat=True)[offset + num - 1:offset + num]):
+        return None
+    return signing.dumps([query, offset + num], salt=_SEARCH_CURSOR_SALT)
+
+
+def iterate_in_chunks(queryset, order='id', limit=None, chunk_size=None):
+    """
+    Iterate over a queryset returned by paginate(), fetching at most chunk_size records per query,
+    so that only one chunk is held in memory at a time whatever the database driver buffers
+    :param queryset: queryset returned by paginate()
+    :param order: order the queryset was paginated with
+    :param limit: maximum number of records to return, None for all of them
+    :param chunk_size: number of records fetched per query, CHUNK_SIZE by default
+    :return: generator of records
+    """
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+    key, descending = _parse_order(order)
+    remaining = limit
+    chunk_queryset = queryset
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        chunk = list(chunk_queryset[:size])
+        for record in chunk:
+            yield record
+        if len(chunk) < size:
+            return
+        if remaining is not None:
+            remaining -= size
+        chunk_queryset = _after(queryset, key, descending, getattr(chunk[-1], key), chunk[-1].pk)
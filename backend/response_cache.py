@@ -0,0 +1,97 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from django.conf import settings
+
+from .caching import TwoTierCache, byte_size
+
+# Responses are kept in a small LRU of each process in front of the shared 'festpal' cache, see settings
+responses = TwoTierCache(getattr(settings, 'FESTPAL_RESPONSE_CACHE', 'default'),
+                         getattr(settings, 'FESTPAL_RESPONSE_CACHE_LOCAL_SIZE', 200),
+                         getattr(settings, 'FESTPAL_RESPONSE_CACHE_LOCAL_TTL', 60),
+                         getattr(settings, 'FESTPAL_RESPONSE_CACHE_VERSION_TTL', 1),
+                         getattr(settings, 'FESTPAL_RESPONSE_CACHE_LOCAL_MAX_BYTES', 16777216))
+
+
+def _namespace(festival_pk):
+    return 'festpal:festival:{0}'.format(festival_pk)
+
+
+def _key(kind, validators):
+    # The ETag covers last_modified and the fields requested, so a festival changed in a way that
+    # was not invalidated explicitly, e.g. in the admin, still gets new keys
+    return '{0}:{1}'.format(kind, validators.etag.strip('"'))
+
+
+def get_response(kind, festival_pk, validators):
+    """
+    Look up the serialized body of a read response
+    :param kind: kind of response, e.g. 'festival' or 'lineup'
+    :param festival_pk: primary key of the festival the response is about
+    :param validators: Validators of the response
+    :return: body of the response, or None if it is not cached
+    """
+    return responses.get(_namespace(festival_pk), _key(kind, validators))
+
+
+def store_response(kind, festival_pk, validators, body):
+    """
+    Cache the serialized body of a read response, unless it is larger than FESTPAL_RESPONSE_CACHE_MAX_BYTES
+    encoded as UTF-8
+    :param kind: kind of response, e.g. 'festival' or 'lineup'
+    :param festival_pk: primary key of the festival the response is about
+    :param validators: Validators of the response
+    :param body: serialized body
+    """
+    if byte_size(body) <= getattr(settings, 'FESTPAL_RESPONSE_CACHE_MAX_BYTES', 1048576):
+        responses.set(_namespace(festival_pk), _key(kind, validators), body)
+
+
+def store_streamed_response(kind, festival_pk, validators, chunks):
+    """
+    Pass the chunks of a streamed body through, caching the body once it is complete if it is small enough
+    :param kind: kind of response, e.g. 'festival' or 'lineup'
+    :param festival_pk: primary key of the festival the response is about
+    :param validators: Validators of the response
+    :param chunks: iterable of text chunks of the body
+    :return: generator of the chunks
+    """
+    max_bytes = getattr(settings, 'FESTPAL_RESPONSE_CACHE_MAX_BYTES', 1048576)
+    parts = []
+    size = 0
+    for chunk in chunks:
+        yield chunk
+        if parts is not None:
+            parts.append(chunk)
+            size += byte_size(chunk)
+            if size > max_bytes:
+                parts = None
+    if parts is not None:
+        responses.set(_namespace(festival_pk), _key(kind, validators), ''.join(parts))
+
+
+def invalidate_festival(festival_pk):
+    """
+    Drop the cached responses about a festival from both tiers, by moving it to a new version.
+    Other processes notice within FESTPAL_RESPONSE_CACHE_VERSION_TTL seconds
+    :param festival_pk: primary key of the festival
+    """
+    responses.bump_version(_namespace(festival_pk))
+
+
+def stats():
+    """
+    :return: dictionary of the hits in this process, hits in the shared cache, misses and hit rate
+    """
+    return responses.stats()
@@ -0,0 +1,117 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Festival
+
+SEARCH_FIELDS = ('name', 'description', 'genre')
+
+FTS_TABLE = Festival._meta.db_table + '_fts'
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def _columns(table=None):
+    prefix = table + '.' if table else ''
+    return ', '.join(prefix + Festival._meta.get_field(field).column for field in SEARCH_FIELDS)
+
+
+def create_search_index(using='default'):
+    """
+    Create the full-text index if it does not exist yet and fill it with the existing festivals.
+    On MySQL this is a FULLTEXT index on the festival table, kept up to date by the database itself.
+    On SQLite it is a separate FTS5 table keyed by festival pk, kept in sync by backend.signals
+    :param using: database alias
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS {0} USING fts5({1}, tokenize=unicode61)'.format(
+                FTS_TABLE, _columns()))
+            cursor.execute('INSERT INTO {0} (rowid, {1}) SELECT {2}, {1} FROM {3} WHERE {2} NOT IN '
+                           '(SELECT rowid FROM {0})'.format(FTS_TABLE, _columns(), Festival._meta.pk.column,
+                                                             Festival._meta.db_table))
+    elif connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW INDEX FROM {0} WHERE Key_name = %s'.format(Festival._meta.db_table), [FTS_TABLE])
+            if not cursor.fetchall():
+                cursor.execute('ALTER TABLE {0} ADD FULLTEXT INDEX {1} ({2})'.format(
+                    Festival._meta.db_table, FTS_TABLE, _columns()))
+
+
+def index_festival(festival, using='default'):
+    """
+    Add a festival to the full-text index or refresh its entry
+    :param festival: Festival object
+    :param using: database alias
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {0} WHERE rowid = %s'.format(FTS_TABLE), [festival.pk])
+        cursor.execute('INSERT INTO {0} (rowid, {1}) VALUES (%s{2})'.format(FTS_TABLE, _columns(),
+                                                                            ', %s' * len(SEARCH_FIELDS)),
+                       [festival.pk] + [getattr(festival, field) for field in SEARCH_FIELDS])
+
+
+def unindex_festival(pk, using='default'):
+    """
+    Remove a festival from the full-text index
+    :param pk: primary key of the festival
+    :param using: database alias
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {0} WHERE rowid = %s'.format(FTS_TABLE), [pk])
+
+
+def search_festivals(festivals, query):
+    """
+    Keep only the festivals matching every word of a search query, each word being matched as
+    a prefix. The festivals are annotated with search_rank, which is higher for more relevant results
+    :param festivals: Festival queryset
+    :param query: search query, as typed by the user
+    :return: filtered queryset
+    """
+    tokens = _TOKEN_PATTERN.findall(query)
+    if not tokens:
+        return festivals.none().extra(select={'search_rank': '0'})
+    vendor = connections[festivals.db].vendor
+    if vendor == 'sqlite':
+        match = ' '.join('"{0}"*'.format(token) for token in tokens)
+        return festivals.extra(select={'search_rank': '-bm25({0})'.format(FTS_TABLE)},
+                               tables=[FTS_TABLE],
+                               where=['{0}.rowid = {1}.{2}'.format(FTS_TABLE, Festival._meta.db_table,
+                                                                   Festival._meta.pk.column),
+                                      '{0} MATCH %s'.format(FTS_TABLE)],
+                               params=[match])
+    if vendor == 'mysql':
+        match = ' '.join('+{0}*'.format(token) for token in tokens)
+        against = 'MATCH ({0}) AGAINST (%s IN BOOLEAN MODE)'.format(_columns(Festival._meta.db_table))
+        return festivals.extra(select={'search_rank': against}, select_params=[match],
+                               where=[against], params=[match])
+    # No full-text index on other databases: match substrings, without ranking
+    for token in tokens:
+        token_filter = Q()
+        for field in SEARCH_FIELDS:
+            token_filter |= Q(**{field + '__icontains': token})
+        festivals = festivals.filter(token_filter)
+    return festivals.extra(select={'search_rank': '0'})
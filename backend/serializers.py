@@ -0,0 +1,182 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import json
+from collections import OrderedDict
+
+from .models import Festival, Concert
+
+STREAM_BUFFER_SIZE = 8192
+
+# Output fields of festivals, in output order, with how to read each of them
+_FESTIVAL_FIELDS = OrderedDict([
+    ('id', lambda festival: festival.pk),
+    ('name', lambda festival: festival.name),
+    ('description', lambda festival: festival.description),
+    ('country', lambda festival: festival.country),
+    ('city', lambda festival: festival.city),
+    ('address', lambda festival: festival.address),
+    ('genre', lambda festival: festival.genre),
+    ('prices', lambda festival: festival.prices),
+    ('uploader', lambda festival: festival.owner.username),
+    ('official', lambda festival: festival.official),
+    ('downloads', lambda festival: festival.download_count),
+    ('votes', lambda festival: festival.vote_count),
+    ('first_uploaded', lambda festival: str(festival.first_uploaded)),
+    ('last_modified', lambda festival: str(festival.last_modified)),
+])
+
+# Columns to load for the festival fields that do not map to a column of the same name
+_FESTIVAL_COLUMNS = {
+    'id': (),
+    'uploader': ('owner', 'owner__username'),
+    'downloads': ('download_count',),
+    'votes': ('vote_count',),
+}
+
+FESTIVAL_FIELDS = tuple(_FESTIVAL_FIELDS.keys())
+
+_CONCERT_FIELDS = OrderedDict([
+    ('id', lambda concert: concert.pk),
+    ('festival', lambda concert: concert.festival_id),
+    ('artist', lambda concert: concert.artist),
+    ('stage', lambda concert: concert.stage),
+    ('day', lambda concert: concert.day),
+    ('start', lambda concert: str(concert.start)),
+    ('end', lambda concert: str(concert.end)),
+    ('first_uploaded', lambda concert: str(concert.first_uploaded)),
+    ('last_modified', lambda concert: str(concert.last_modified)),
+])
+
+CONCERT_FIELDS = tuple(_CONCERT_FIELDS.keys())
+
+
+class InvalidFieldsError(Exception):
+    pass
+
+
+def parse_fields(value, allowed, aliases=None):
+    """
+    Parse the fields parameter of a read request
+    :param value: comma separated list of field names, or None if all fields are requested
+    :param allowed: names of the fields that can be requested
+    :param aliases: dictionary of alternative names for some of the allowed fields
+    :return: list of requested fields from allowed, or None for all fields
+    """
+    if value is None:
+        return None
+    if aliases is None:
+        aliases = {}
+    fields = []
+    for field in value.split(','):
+        field = aliases.get(field.strip(), field.strip())
+        if field not in allowed:
+            raise InvalidFieldsError('Field %s not recognised' % field)
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+
+def festivals_for_serialization(festivals=None, fields=None):
+    """
+    Prepare a Festival queryset so that festival_to_dict() needs no further queries:
+    the owner is joined in the same query.
+    If only some fields are requested, the other columns are not fetched
+    :param festivals: Festival queryset, all festivals by default
+    :param fields: list of FESTIVAL_FIELDS to load, None for all of them
+    :return: queryset
+    """
+    if festivals is None:
+        festivals = Festival.objects.all()
+    if fields is None:
+        fields = FESTIVAL_FIELDS
+    else:
+        columns = []
+        for field in fields:
+            columns.extend(_FESTIVAL_COLUMNS.get(field, (field,)))
+        festivals = festivals.only(*columns)
+    if 'uploader' in fields:
+        festivals = festivals.select_related('owner')
+    return festivals
+
+
+def festival_to_dict(festival, fields=None):
+    """
+    Serialize a festival fetched through festivals_for_serialization()
+    :param festival: Festival object
+    :param fields: list of FESTIVAL_FIELDS to output, None for all of them
+    :return: dictionary ready to be dumped as JSON
+    """
+    if fields is None:
+        fields = FESTIVAL_FIELDS
+    return OrderedDict((field, _FESTIVAL_FIELDS[field](festival)) for field in fields)
+
+
+def concerts_for_serialization(concerts=None, fields=None):
+    """
+    Prepare a Concert queryset for concert_to_dict(), fetching only the columns of the fields requested
+    :param concerts: Concert queryset, all concerts by default
+    :param fields: list of CONCERT_FIELDS to load, None for all of them
+    :return: queryset
+    """
+    if concerts is None:
+        concerts = Concert.objects.all()
+    if fields is not None:
+        concerts = concerts.only(*[field for field in fields if field != 'id'])
+    return concerts
+
+
+def concert_to_dict(concert, fields=None):
+    """
+    Serialize a concert of a festival lineup
+    :param concert: Concert object
+    :param fields: list of CONCERT_FIELDS to output, None for all of them
+    :return: dictionary ready to be dumped as JSON
+    """
+    if fields is None:
+        fields = CONCERT_FIELDS
+    return OrderedDict((field, _CONCERT_FIELDS[field](concert)) for field in fields)
+
+
+def lineup_to_dict(concerts, fields=None):
+    """
+    Group the serialized concerts of a festival by day, then by stage
+    :param concerts: concerts of the festival, ordered by day and stage
+    :param fields: list of CONCERT_FIELDS to output, None for all of them
+    :return: dictionary of days, each a dictionary of stages, each a list of concerts
+    """
+    lineup = OrderedDict()
+    for concert in concerts:
+        stages = lineup.setdefault(str(concert.day), OrderedDict())
+        stages.setdefault(str(concert.stage), []).append(concert_to_dict(concert, fields))
+    return lineup
+
+
+def stream_json_list(records, serialize):
+    """
+    Serialize records into a JSON array piece by piece, for use with StreamingHttpResponse.
+    Records are consumed lazily and output is buffered into chunks of about STREAM_BUFFER_SIZE characters
+    :param records: iterable of records
+    :param serialize: function turning a record into a JSON-serializable object
+    :return: generator of JSON text chunks
+    """
+    buffer = '['
+    separator = ''
+    for record in records:
+        buffer += separator + json.dumps(serialize(record))
+        separator = ','
+        if len(buffer) >= STREAM_BUFFER_SIZE:
+            yield buffer
+            buffer = ''
+    yield buffer + ']'
@@ -0,0 +1,125 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Festival, Concert, Tombstone, Client, client_permissions
+from .search import index_festival, unindex_festival
+from .tokens import revoke_tokens
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Festival)
+def update_festival_price_tiers(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is not None and 'prices' not in update_fields:
+        return
+    instance.update_price_tiers(using)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Festival)
+def index_saved_festival(sender, instance, using, **kwargs):
+    index_festival(instance, using)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_delete, sender=Festival)
+def unindex_deleted_festival(sender, instance, using, **kwargs):
+    unindex_festival(instance.pk, using)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_delete, sender=Concert)
+def touch_festival_of_deleted_concert(sender, instance, using, **kwargs):
+    # The lineup validators can not see a concert that is gone, so its festival carries the change
+    Festival.objects.using(using).filter(pk=instance.festival_id).update(last_modified=timezone.now())
+
+
+# noinspection PyUnusedLocal
+@receiver(post_delete, sender=Festival)
+@receiver(post_delete, sender=Concert)
+def record_tombstone(sender, instance, using, **kwargs):
+    Tombstone.objects.using(using).create(model=sender._meta.model_name, object_id=instance.pk)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def clear_client_permissions(sender, instance, **kwargs):
+    # The name it was read with as well, in case the client was renamed
+    client_permissions.delete(instance.name)
+    if getattr(instance, 'loaded_name', instance.name) != instance.name:
+        client_permissions.delete(instance.loaded_name)
+
+
+# noinspection PyUnusedLocal
+@receiver(m2m_changed, sender=Festival.voters.through)
+@receiver(m2m_changed, sender=Festival.downloads.through)
+def recount_festival_users(sender, instance, action, reverse, pk_set, using, **kwargs):
+    # vote() and backend.buffers keep the counters themselves; this covers changes made otherwise, e.g. in the admin
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    field_name = 'voters' if sender is Festival.voters.through else 'downloads'
+    if not reverse:
+        Festival.recount(field_name, [instance.pk], using)
+    else:
+        Festival.recount(field_name, pk_set, using)
+
+
+# noinspection PyUnusedLocal
+@receiver(pre_delete, sender=User)
+def note_festivals_of_deleted_user(sender, instance, using, **kwargs):
+    # Deleting a user removes their votes and downloads without m2m_changed, so their festivals are recounted after
+    instance._counted_festivals = dict(
+        (field_name, list(getattr(Festival, field_name).through.objects.using(using)
+                          .filter(user_id=instance.pk).values_list('festival_id', flat=True)))
+        for field_name in Festival.COUNTERS)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_delete, sender=User)
+def recount_festivals_of_deleted_user(sender, instance, using, **kwargs):
+    for field_name, pks in getattr(instance, '_counted_festivals', {}).items():
+        # In batches, within the limit of query parameters of SQLite
+        for start in range(0, len(pks), 500):
+            Festival.recount(field_name, pks[start:start + 500], using)
+
+
+# noinspection PyUnusedLocal
+@receiver(pre_save, sender=User)
+def note_password_change(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (update_fields is not None and 'password' not in update_fields):
+        return
+    stored = list(User.objects.filter(pk=instance.pk).values_list('password', flat=True))
+    instance._password_changed = stored != [instance.password]
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=User)
+def revoke_tokens_of_changed_user(sender, instance, created, **kwargs):
+    # Tokens are checked without looking the user up, so disabling an account or changing its password
+    # has to revoke them
+    if not created and (not instance.is_active or getattr(instance, '_password_changed', False)):
+        revoke_tokens(instance.pk)
+    # Later saves of the same instance, e.g. of last_login, are not password changes
+    instance._password_changed = False
+
+
+# noinspection PyUnusedLocal
+@receiver(post_delete, sender=User)
+def revoke_tokens_of_deleted_user(sender, instance, **kwargs):
+    revoke_tokens(instance.pk)
@@ -0,0 +1,99 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import calendar
+import datetime
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Festival, Concert, Tombstone
+from .pagination import paginate, iterate_in_chunks
+from .serializers import festivals_for_serialization, festival_to_dict, concerts_for_serialization, concert_to_dict
+from .serializers import stream_json_list
+
+# Rows are stamped when saved but become visible only when their transaction commits, so a sync
+# looks this far back before its token to pick up rows committed after the previous sync ran
+SYNC_MARGIN = datetime.timedelta(seconds=5)
+
+
+def tombstone_cutoff():
+    """
+    :return: aware datetime before which tombstones are pruned, see FESTPAL_TOMBSTONE_RETENTION
+    """
+    return timezone.now() - datetime.timedelta(seconds=getattr(settings, 'FESTPAL_TOMBSTONE_RETENTION', 2592000))
+
+
+def make_sync_token(moment):
+    """
+    :param moment: aware datetime the changes were collected at
+    :return: token to be sent back by the client on its next sync
+    """
+    return str(calendar.timegm(moment.utctimetuple()) * 1000000 + moment.microsecond)
+
+
+def parse_sync_token(token):
+    """
+    :param token: token returned by make_sync_token()
+    :return: aware datetime, or None if the token is not valid or older than the tombstones kept,
+        in which case the client has to do a full sync
+    """
+    if not token.isdigit():
+        return None
+    try:
+        since = datetime.datetime.fromtimestamp(int(token) / 1000000, timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+    # Deletions before the cutoff may have been pruned, see prune_tombstones
+    if since - SYNC_MARGIN < tombstone_cutoff():
+        return None
+    return since
+
+
+def stream_changes(since=None):
+    """
+    Stream the festivals and concerts created or modified after a moment, and the ones deleted since,
+    as a JSON object, for use with StreamingHttpResponse. Changes are found through the indexes on
+    last_modified and on the deletion time of tombstones, and read in chunks, so that a full sync
+    does not hold the whole catalogue in memory
+    :param since: aware datetime of the previous sync, None for a full sync
+    :return: generator of JSON text chunks, the object including the token for the next sync
+    """
+    now = timezone.now()
+    festivals = festivals_for_serialization()
+    concerts = concerts_for_serialization()
+    tombstones = Tombstone.objects.none()
+    if since is not None:
+        since -= SYNC_MARGIN
+        festivals = festivals.filter(last_modified__gt=since)
+        concerts = concerts.filter(last_modified__gt=since)
+        tombstones = Tombstone.objects.filter(deleted__gt=since)
+
+    yield '{"festivals": '
+    for chunk in stream_json_list(iterate_in_chunks(paginate(festivals, 'last_modified'), 'last_modified'),
+                                  festival_to_dict):
+        yield chunk
+    yield ', "concerts": '
+    for chunk in stream_json_list(iterate_in_chunks(paginate(concerts, 'last_modified'), 'last_modified'),
+                                  concert_to_dict):
+        yield chunk
+    deleted = OrderedDict([('festivals', []), ('concerts', [])])
+    for model, object_id in tombstones.values_list('model', 'object_id'):
+        if model == Festival._meta.model_name:
+            deleted['festivals'].append(object_id)
+        elif model == Concert._meta.model_name:
+            deleted['concerts'].append(object_id)
+    yield ', "deleted": {0}, "token": {1}}}'.format(json.dumps(deleted), json.dumps(make_sync_token(now)))
@@ -1,3 +1,5 @@
+import json
+
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -33,3 +35,11 @@ def login(client):
     User.objects.create_user('testuser', password='testpassword')
     client.login(username='testuser', password='testpassword')
     return User.objects.get(username='testuser')
+
+
+def response_json(response):
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    return json.loads(content.decode('utf-8'))
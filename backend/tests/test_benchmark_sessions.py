@@ -0,0 +1,29 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from backend.models import Client
+
+
+class BenchmarkSessionsTests(TestCase):
+    def test_benchmark(self):
+        """
+        benchmark_sessions is to report the session queries per request of each session store,
+        and those of the client separately, leaving no data behind
+        """
+        output = StringIO()
+        call_command('benchmark_sessions', requests=5, stdout=output)
+        lines = [line.split() for line in output.getvalue().splitlines()[1:]]
+        self.assertEqual([line[0] for line in lines], ['db', 'cached_db', 'cache', 'signed_cookies'])
+        rows = dict((line[0], line[1:]) for line in lines)
+        # Columns: queries, session, user and client queries per request, then milliseconds
+        self.assertEqual(rows['db'][1], '1.00')
+        self.assertEqual(rows['cached_db'][1], '0.00')
+        self.assertEqual(rows['cache'][1], '0.00')
+        self.assertEqual(rows['signed_cookies'][1], '0.00')
+        # Inside the test's transaction the permissions of the client are not cached
+        self.assertEqual(rows['signed_cookies'][3], '1.00')
+        self.assertFalse(User.objects.filter(username='benchmark_sessions').exists())
+        self.assertFalse(Client.objects.filter(name='benchmark_sessions').exists())
@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from backend.buffers import PairBuffer, write_festival_users, vote_buffer, download_buffer
+from backend.models import Festival
+from backend.tests.helpers import login, create_festival, create_user, create_client
+
+
+class PairBufferTests(TestCase):
+    def setUp(self):
+        self.festival = create_festival('test', create_user())
+        self.festival.save()
+        self.voters = [User.objects.create(username='voter{0}'.format(index)) for index in range(3)]
+
+    def test_flush_writes_new_pairs(self):
+        """
+        PairBuffer is to write each pair once, leave existing ones alone
+        and increase the counter by the number of pairs written
+        """
+        self.festival.voters.add(self.voters[0])
+        buffer = PairBuffer(write_festival_users('voters'))
+        for voter in self.voters + self.voters:
+            buffer.add(self.festival.pk, voter.pk)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(len(buffer), 0)
+        festival = Festival.objects.get(pk=self.festival.pk)
+        self.assertEqual(festival.vote_count, 3)
+        self.assertEqual(set(festival.voters.all()), set(self.voters))
+
+    def test_flush_large_batch(self):
+        """
+        PairBuffer is to write more pairs at once than a query can take parameters
+        """
+        other = create_festival('testest', create_user())
+        other.save()
+        User.objects.bulk_create([User(username='many{0}'.format(index)) for index in range(600)])
+        users = list(User.objects.filter(username__startswith='many').values_list('pk', flat=True))
+        self.festival.voters.add(users[0])
+        buffer = PairBuffer(write_festival_users('voters'), max_size=2000)
+        for festival in (self.festival, other):
+            for user in users:
+                buffer.add(festival.pk, user)
+        self.assertEqual(buffer.flush(), 1200)
+        self.assertEqual(Festival.objects.get(pk=self.festival.pk).vote_count, 600)
+        self.assertEqual(Festival.objects.get(pk=other.pk).vote_count, 600)
+
+    def test_flush_when_full(self):
+        """
+        PairBuffer is to write the pairs as soon as max_size of them are waiting
+        """
+        buffer = PairBuffer(write_festival_users('voters'), max_size=2)
+        buffer.add(self.festival.pk, self.voters[0].pk)
+        self.assertEqual(Festival.objects.get(pk=self.festival.pk).vote_count, 0)
+        buffer.add(self.festival.pk, self.voters[1].pk)
+        self.assertEqual(Festival.objects.get(pk=self.festival.pk).vote_count, 2)
+        self.assertEqual(len(buffer), 0)
+
+    def test_journal_replayed(self):
+        """
+        PairBuffer is to replay the pairs of its journal that were not written before a crash
+        """
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'votes')
+            crashed = PairBuffer(write_festival_users('voters'), path=path)
+            crashed.add(self.festival.pk, self.voters[0].pk)
+            crashed.add(self.festival.pk, self.voters[1].pk)
+
+            buffer = PairBuffer(write_festival_users('voters'), path=path)
+            buffer.replay()
+            self.assertEqual(buffer.flush(), 2)
+            self.assertEqual(Festival.objects.get(pk=self.festival.pk).vote_count, 2)
+            with open('{0}.{1}'.format(path, os.getpid())) as journal:
+                self.assertEqual(journal.read(), '')
+        finally:
+            shutil.rmtree(directory)
+
+    def test_journal_per_process(self):
+        """
+        PairBuffer is to keep a journal per process, and replay only those of processes no longer running
+        """
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'votes')
+            with patch('backend.buffers.os.getpid', return_value=101):
+                worker = PairBuffer(write_festival_users('voters'), path=path)
+                worker.add(self.festival.pk, self.voters[0].pk)
+            with patch('backend.buffers.os.getpid', return_value=102):
+                other = PairBuffer(write_festival_users('voters'), path=path)
+                other.add(self.festival.pk, self.voters[1].pk)
+                # Writing the other worker's pairs is not to drop those of the first one
+                other.flush()
+            self.assertEqual(sorted(os.listdir(directory)), ['votes.101', 'votes.102'])
+
+            buffer = PairBuffer(write_festival_users('voters'), path=path)
+            with patch('backend.buffers._process_alive', return_value=True):
+                buffer.replay()
+            self.assertEqual(len(buffer), 0)
+            with patch('backend.buffers._process_alive', return_value=False):
+                buffer.replay()
+            self.assertEqual(len(buffer), 1)
+            self.assertEqual(os.listdir(directory), ['votes.{0}'.format(os.getpid())])
+            self.assertEqual(buffer.flush(), 1)
+            festival = Festival.objects.get(pk=self.festival.pk)
+            self.assertEqual(set(festival.voters.all()), set(self.voters[:2]))
+        finally:
+            shutil.rmtree(directory)
+
+
+    def test_restarted_after_fork(self):
+        """
+        PairBuffer is to start a thread of its own in a process forked after it was started,
+        leaving the pairs of the parent to it
+        """
+        buffer = PairBuffer(write_festival_users('voters'))
+        with patch.object(PairBuffer, '_run'), patch('backend.buffers.atexit.register'):
+            with patch('backend.buffers.os.getpid', return_value=201):
+                buffer.start()
+                buffer.add(self.festival.pk, self.voters[0].pk)
+                parent_thread = buffer._thread
+            with patch('backend.buffers.os.getpid', return_value=202):
+                buffer.add(self.festival.pk, self.voters[1].pk)
+                self.assertIsNot(buffer._thread, parent_thread)
+                self.assertEqual(buffer._pid, 202)
+                self.assertEqual(buffer.flush(), 1)
+            buffer._thread.join()
+        festival = Festival.objects.get(pk=self.festival.pk)
+        self.assertEqual(list(festival.voters.all()), [self.voters[1]])
+
+class BufferedVoteTests(TestCase):
+    def tearDown(self):
+        vote_buffer.flush()
+
+    @override_settings(FESTPAL_VOTE_BUFFER=True)
+    def test_buffered_vote(self):
+        """
+        vote() is to queue the vote in the buffer when buffering is enabled,
+        the vote being counted once the buffer is flushed
+        """
+        user = login(self.client)
+
+        client = create_client('test')
+        client.vote_access = True
+        client.save()
+        festival = create_festival('test', create_user())
+        festival.save()
+        response = self.client.post('/backend/v/', {'client': 'test', 'id': festival.pk})
+        self.assertEqual('0', response.content.decode('utf-8'))
+        self.assertEqual(festival.voters_number(), 0)
+        vote_buffer.flush()
+        self.assertEqual(list(festival.voters.all()), [user])
+        response = self.client.post('/backend/v/', {'client': 'test', 'id': festival.pk})
+        self.assertEqual('1', response.content.decode('utf-8'))
+
+
+class DownloadTrackingTests(TestCase):
+    def setUp(self):
+        download_buffer.clear()
+
+    def tearDown(self):
+        download_buffer.clear()
+
+    def test_downloads_recorded(self):
+        """
+        Reading the information or the concerts of a festival is to record a download
+        of the festival by the user, written when the buffer is flushed
+        """
+        user = login(self.client)
+
+        owner = create_user()
+        festival = create_festival('test', owner)
+        festival.save()
+        other = create_festival('testest', owner)
+        other.save()
+        self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk})
+        self.client.post('/backend/mult/conc/', {'client': 'test', 'id': festival.pk})
+        self.client.post('/backend/mult/conc/', {'client': 'test', 'id': other.pk})
+        self.assertEqual(festival.downloads_number(), 0)
+        self.assertEqual(download_buffer.flush(), 2)
+        festival.refresh_from_db()
+        self.assertEqual(list(festival.downloads.all()), [user])
+        self.assertEqual(festival.download_count, 1)
+        self.assertEqual(Festival.objects.get(pk=other.pk).download_count, 1)
+
+    def test_downloads_change_etag_only(self):
+        """
+        Recording downloads is to leave last_modified of the festival alone,
+        while changing its ETag, as the download count is part of the festival's information
+        """
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        festival.refresh_from_db()
+        response = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk})
+        download_buffer.flush()
+        self.assertEqual(Festival.objects.get(pk=festival.pk).last_modified, festival.last_modified)
+        refreshed = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk},
+                                     HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(json.loads(refreshed.content.decode('utf-8'))['downloads'], 1)
+
+    def test_not_modified_not_recorded(self):
+        """
+        Answering a festival read with 304 is not to record a download
+        """
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk})
+        download_buffer.flush()
+        response = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk})
+        download_buffer.flush()
+        revalidated = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk},
+                                       HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(len(download_buffer), 0)
@@ -0,0 +1,122 @@
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from backend.caching import LRUCache, TwoTierCache
+
+
+class LRUCacheTests(TestCase):
+    def test_least_recently_used_evicted(self):
+        """
+        LRUCache is to evict the least recently used entry once it holds max_size entries
+        """
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        """
+        LRUCache is to forget entries ttl seconds after they were set
+        """
+        cache = LRUCache(ttl=10)
+        with patch('backend.caching.time.monotonic', return_value=100):
+            cache.set('a', 1)
+        with patch('backend.caching.time.monotonic', return_value=109):
+            self.assertEqual(cache.get('a'), 1)
+        with patch('backend.caching.time.monotonic', return_value=110):
+            self.assertEqual(cache.get('a', 'expired'), 'expired')
+        self.assertEqual(len(cache), 0)
+
+    def test_max_bytes(self):
+        """
+        LRUCache is to evict the least recently used entries once their values exceed max_bytes,
+        and not keep a value larger than max_bytes at all
+        """
+        cache = LRUCache(max_size=10, max_bytes=10)
+        cache.set('a', 'xxxx')
+        cache.set('b', 'xxxx')
+        cache.set('b', 'xxx')
+        self.assertEqual(len(cache), 2)
+        cache.set('c', 'xxxx')
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.get('b'), 'xxx')
+        cache.set('d', 'x' * 11)
+        self.assertEqual(cache.get('d'), None)
+        self.assertEqual(cache.get('c'), 'xxxx')
+        cache.delete('c')
+        cache.set('e', 'xxxxxxx')
+        self.assertEqual(cache.get('b'), 'xxx')
+
+    def test_max_bytes_counts_encoded_size(self):
+        """
+        LRUCache is to measure strings by their size encoded as UTF-8, not by their number of characters
+        """
+        cache = LRUCache(max_size=10, max_bytes=8)
+        cache.set('a', 'ää')
+        cache.set('b', 'öö')
+        self.assertEqual(cache.get('a'), 'ää')
+        cache.set('c', 'üü')
+        self.assertEqual(cache.get('b'), None)
+        cache.set('d', 'ßßßßß')
+        self.assertEqual(cache.get('d'), None)
+
+    def test_stats(self):
+        """
+        LRUCache is to count the hits and misses of its lookups
+        """
+        cache = LRUCache(max_size=10)
+        self.assertEqual(cache.stats()['hit_rate'], None)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        self.assertEqual(dict(cache.stats()), {'hits': 3, 'misses': 1, 'hit_rate': 0.75, 'size': 1, 'max_size': 10})
+
+
+@override_settings(CACHES={'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                      'LOCATION': 'two-tier-tests'}})
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+
+    def test_shared_tier(self):
+        """
+        TwoTierCache is to find in the shared cache the entries set by another process,
+        keeping them in its local cache afterwards
+        """
+        writer = TwoTierCache('shared')
+        reader = TwoTierCache('shared')
+        writer.set('festival:1', 'info', 'body')
+        self.assertEqual(reader.get('festival:1', 'info'), 'body')
+        self.assertEqual(reader.get('festival:1', 'info'), 'body')
+        self.assertEqual(reader.get('festival:1', 'lineup'), None)
+        self.assertEqual(dict(reader.stats()), {'local_hits': 1, 'shared_hits': 1, 'misses': 1, 'hit_rate': 2 / 3})
+
+    def test_version_bump_invalidates_both_tiers(self):
+        """
+        TwoTierCache is to make the keys of a namespace unreachable in every process once its version is bumped,
+        other processes noticing when the version they read expires
+        """
+        writer = TwoTierCache('shared', version_ttl=10)
+        reader = TwoTierCache('shared', version_ttl=10)
+        with patch('backend.caching.time.monotonic', return_value=100):
+            writer.set('festival:1', 'info', 'old')
+            writer.set('festival:2', 'info', 'other')
+            self.assertEqual(reader.get('festival:1', 'info'), 'old')
+            writer.bump_version('festival:1')
+            self.assertEqual(writer.get('festival:1', 'info'), None)
+            self.assertEqual(reader.get('festival:1', 'info'), 'old')
+        with patch('backend.caching.time.monotonic', return_value=110):
+            self.assertEqual(reader.get('festival:1', 'info'), None)
+            self.assertEqual(reader.get('festival:2', 'info'), 'other')
+            writer.bump_version('festival:1')
+            writer.set('festival:1', 'info', 'new')
+            self.assertEqual(writer.get('festival:1', 'info'), 'new')
@@ -1,7 +1,13 @@
-from django.test import TestCase
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.db import connection, OperationalError
+from django.test import TestCase, TransactionTestCase
 
 from backend.models import InvalidPermissionStringError, Client
-from backend.models import client_has_permission
+from backend.models import client_has_permission, client_permissions
 from backend.tests.helpers import create_client
 
 
@@ -37,3 +43,125 @@ class ClientHasPermissionTests(TestCase):
         num_after_count = Client.objects.all().count()
         self.assertEqual(num_before_count, num_after_count)
         self.assertFalse(permission)
+
+
+class ClientPermissionCacheTests(TransactionTestCase):
+    # Permissions are only cached outside transactions, which TestCase wraps every test in
+
+    def setUp(self):
+        client_permissions.clear()
+        client_permissions.hits = client_permissions.misses = 0
+
+    def tearDown(self):
+        client_permissions.clear()
+
+    def test_permissions_cached(self):
+        """
+        client_has_permission() is to answer from the cache, without queries,
+        once the permissions of a client have been read
+        """
+        client = create_client('test')
+        client.write_access = True
+        client.save()
+        self.assertTrue(client_has_permission('test', 'write'))
+        with self.assertNumQueries(0):
+            self.assertTrue(client_has_permission('test', 'write'))
+            self.assertTrue(client_has_permission('test', 'read'))
+            self.assertFalse(client_has_permission('test', 'delete'))
+
+    def test_cache_cleared_on_change(self):
+        """
+        client_has_permission() is to see changes to clients saved or deleted since it cached them
+        """
+        client_has_permission('test', 'write')
+        client = Client.objects.get(name='test')
+        client.write_access = True
+        client.save()
+        self.assertTrue(client_has_permission('test', 'write'))
+        client.delete()
+        self.assertFalse(client_has_permission('test', 'write'))
+        self.assertEqual(Client.objects.filter(name='test').count(), 1)
+
+    def test_other_clients_kept(self):
+        """
+        client_has_permission() is to keep the cached permissions of other clients when a client is saved
+        """
+        client_has_permission('test', 'read')
+        client_has_permission('new', 'read')
+        with self.assertNumQueries(0):
+            self.assertTrue(client_has_permission('test', 'read'))
+
+    def test_cache_cleared_on_rename(self):
+        """
+        client_has_permission() is not to answer for the old name of a renamed client from the cache
+        """
+        client = create_client('test')
+        client.write_access = True
+        client.save()
+        self.assertTrue(client_has_permission('test', 'write'))
+        client = Client.objects.get(name='test')
+        client.name = 'renamed'
+        client.save()
+        self.assertFalse(client_has_permission('test', 'write'))
+
+    def test_admin_stats(self):
+        """
+        The client list of the admin is to show the hit rate of the permission cache
+        """
+        client_has_permission('test', 'read')
+        client_has_permission('test', 'read')
+        client_has_permission('test', 'read')
+        client_has_permission('test', 'read')
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        response = self.client.get('/admin/backend/client/')
+        self.assertContains(response, '3 hits, 1 misses')
+        self.assertContains(response, '75% hit rate')
+
+
+class ClientRegistrationConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        client_permissions.clear()
+
+    def tearDown(self):
+        client_permissions.clear()
+
+    def test_single_query_for_existing_client(self):
+        """
+        client_has_permission() is to read an existing client with a single query
+        """
+        create_client('test')
+        with self.assertNumQueries(1):
+            self.assertTrue(client_has_permission('test', 'read'))
+
+    def test_concurrent_registration(self):
+        """
+        client_has_permission() is to register a new client exactly once
+        when many requests for it arrive at the same time
+        """
+        names = ['test{0}'.format(index % 3) for index in range(24)]
+        barrier = threading.Barrier(8)
+
+        def check(name):
+            try:
+                barrier.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            try:
+                for attempt in range(50):
+                    try:
+                        return client_has_permission(name, 'read')
+                    except OperationalError as error:
+                        # The in-memory SQLite test database is shared between threads in shared-cache mode,
+                        # where a table locked by another connection is an error rather than something to wait for
+                        if 'locked' not in str(error):
+                            raise
+                        time.sleep(0.01)
+                raise AssertionError('Client table locked for too long')
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(check, names))
+        self.assertEqual(results, [True] * len(names))
+        self.assertEqual(sorted(Client.objects.values_list('name', flat=True)), ['test0', 'test1', 'test2'])
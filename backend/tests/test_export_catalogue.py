@@ -0,0 +1,119 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from backend.management.commands import export_catalogue
+from backend.tests.helpers import create_festival, create_user, create_concert
+
+
+def interrupted(after):
+    """
+    Wrap iterate_in_chunks so that the export fails after some records
+    """
+    iterate_in_chunks = export_catalogue.iterate_in_chunks
+
+    def iterate(*args, **kwargs):
+        for index, record in enumerate(iterate_in_chunks(*args, **kwargs)):
+            if index == after:
+                raise KeyboardInterrupt
+            yield record
+    return iterate
+
+
+class ExportCatalogueTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.user = create_user()
+        self.festivals = []
+        for index in range(5):
+            festival = create_festival('test{0}'.format(index), self.user)
+            festival.save()
+            self.festivals.append(festival)
+        create_concert(self.festivals[0], 'test')
+        self.festivals[1].voters.add(self.user)
+        self.festivals[2].downloads.add(self.user)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_jsonl(self, name):
+        with gzip.open(os.path.join(self.directory, name), 'rt', encoding='utf-8') as source:
+            return [json.loads(line) for line in source]
+
+    def test_export_jsonl(self):
+        """
+        export_catalogue is to write the festivals, concerts, votes and downloads to gzipped JSON Lines files
+        """
+
+        call_command('export_catalogue', self.directory, gzip=True, chunk_size=2, stdout=StringIO())
+
+        festivals = self.read_jsonl('festivals.jsonl.gz')
+        self.assertEqual([festival['name'] for festival in festivals], ['test{0}'.format(i) for i in range(5)])
+        self.assertEqual(festivals[0]['owner_id'], self.user.pk)
+        self.assertEqual(festivals[0]['last_modified'], self.festivals[0].last_modified.isoformat())
+        self.assertEqual([concert['artist'] for concert in self.read_jsonl('concerts.jsonl.gz')], ['test'])
+        self.assertEqual([(vote['festival_id'], vote['user_id']) for vote in self.read_jsonl('votes.jsonl.gz')],
+                         [(self.festivals[1].pk, self.user.pk)])
+        self.assertEqual([download['festival_id'] for download in self.read_jsonl('downloads.jsonl.gz')],
+                         [self.festivals[2].pk])
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['concerts.jsonl.gz', 'downloads.jsonl.gz', 'festivals.jsonl.gz', 'votes.jsonl.gz'])
+
+    def test_export_csv(self):
+        """
+        export_catalogue is to write CSV files with a header row when asked to
+        """
+
+        call_command('export_catalogue', self.directory, format='csv', only=['festivals'], stdout=StringIO())
+
+        with io.open(os.path.join(self.directory, 'festivals.csv'), encoding='utf-8', newline='') as source:
+            rows = list(csv.DictReader(source))
+        self.assertEqual([row['name'] for row in rows], ['test{0}'.format(i) for i in range(5)])
+        self.assertEqual(rows[0]['id'], str(self.festivals[0].pk))
+        self.assertEqual(os.listdir(self.directory), ['festivals.csv'])
+
+    def test_resume(self):
+        """
+        export_catalogue is to continue an interrupted export after the last chunk written,
+        without repeating or losing rows
+        """
+
+        with patch.object(export_catalogue, 'iterate_in_chunks', interrupted(3)):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('export_catalogue', self.directory, gzip=True, chunk_size=2, only=['festivals'],
+                             stdout=StringIO())
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'festivals.jsonl.gz.progress')))
+
+        call_command('export_catalogue', self.directory, gzip=True, chunk_size=2, only=['festivals'], resume=True,
+                     stdout=StringIO())
+        self.assertEqual([festival['name'] for festival in self.read_jsonl('festivals.jsonl.gz')],
+                         ['test{0}'.format(i) for i in range(5)])
+        self.assertEqual(os.listdir(self.directory), ['festivals.jsonl.gz'])
+
+    def test_resume_before_first_chunk(self):
+        """
+        export_catalogue is to redo an export interrupted before its first chunk was written,
+        rather than take the file for a complete export
+        """
+
+        with patch.object(export_catalogue, 'iterate_in_chunks', interrupted(1)):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('export_catalogue', self.directory, format='csv', chunk_size=2, only=['festivals'],
+                             stdout=StringIO())
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'festivals.csv.progress')))
+
+        call_command('export_catalogue', self.directory, format='csv', chunk_size=2, only=['festivals'],
+                     resume=True, stdout=StringIO())
+        with io.open(os.path.join(self.directory, 'festivals.csv'), encoding='utf-8', newline='') as source:
+            rows = list(csv.DictReader(source))
+        self.assertEqual([row['name'] for row in rows], ['test{0}'.format(i) for i in range(5)])
+        self.assertEqual(os.listdir(self.directory), ['festivals.csv'])
@@ -1,6 +1,7 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-from backend.models import InvalidInputOrDifferentCurrencyError
+from backend.models import InvalidInputOrDifferentCurrencyError, PriceTier, Festival
 from backend.tests.helpers import create_festival, create_user
 
 
@@ -128,3 +129,48 @@ class FestivalMethodTests(TestCase):
 
         self.assertTrue(festival.price_is_in_range(max_price='$100'))
         self.assertTrue(festival.price_is_in_range(max_price='$ 100'))
+
+    def test_price_tiers_updated_on_save(self):
+        """
+        saving a festival is to replace its price tiers with the ones parsed from the prices string,
+        skipping prices that can not be parsed
+        """
+        festival = create_festival('test', create_user())
+
+        festival.prices = '3e 50e 200e'
+        festival.save()
+        tiers = PriceTier.objects.filter(festival=festival).order_by('amount')
+        self.assertEqual([(tier.amount, tier.currency) for tier in tiers], [(3, 'e'), (50, 'e'), (200, 'e')])
+
+        festival.prices = '$25 free'
+        festival.save()
+        tiers = PriceTier.objects.filter(festival=festival)
+        self.assertEqual([(tier.amount, tier.currency) for tier in tiers], [(25, '$')])
+
+    def test_vote_count_follows_voters(self):
+        """
+        vote_count is to follow changes made to the voters of a festival, e.g. in the admin
+        """
+        festival = create_festival('test', create_user())
+        festival.save()
+        voters = [User.objects.create(username='voter{0}'.format(index)) for index in range(3)]
+        festival.voters.add(*voters)
+        self.assertEqual(Festival.objects.get(pk=festival.pk).vote_count, 3)
+        festival.voters.remove(voters[0])
+        self.assertEqual(Festival.objects.get(pk=festival.pk).vote_count, 2)
+        festival.voters.clear()
+        self.assertEqual(Festival.objects.get(pk=festival.pk).vote_count, 0)
+
+    def test_counts_follow_deleted_users(self):
+        """
+        vote_count and download_count are not to count the votes and downloads of deleted users
+        """
+        festival = create_festival('test', create_user())
+        festival.save()
+        voters = [User.objects.create(username='voter{0}'.format(index)) for index in range(2)]
+        festival.voters.add(*voters)
+        festival.downloads.add(*voters)
+        voters[0].delete()
+        festival = Festival.objects.get(pk=festival.pk)
+        self.assertEqual(festival.vote_count, 1)
+        self.assertEqual(festival.download_count, 1)
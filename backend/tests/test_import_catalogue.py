@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from backend.filters import filter_festivals
+from backend.models import Festival, Concert, PriceTier
+from backend.tests.helpers import create_festival, create_user, create_concert
+
+
+class ImportCatalogueTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.owner = create_user()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as destination:
+            destination.write(content)
+        return path
+
+    def test_import_csv(self):
+        """
+        import_catalogue is to import festivals and their concerts from CSV files,
+        filling the price tiers and the search index of the festivals
+        """
+
+        festivals = self.write_file('festivals.csv', 'name,genre,prices,official\n'
+                                                     'test,rock,20e 40e,\n'
+                                                     'testest,metal,,1\n')
+        concerts = self.write_file('concerts.csv', 'festival,artist,stage,day,start,end\n'
+                                                   'test,artist1,1,1,1444000000,1444003600\n'
+                                                   'testest,artist2,,,1444000000,1444003600\n')
+        output = StringIO()
+        call_command('import_catalogue', festivals=festivals, concerts=concerts, owner='user', stdout=output)
+
+        festival = Festival.objects.get(name='test')
+        self.assertEqual((festival.genre, festival.prices, festival.official, festival.owner),
+                         ('rock', '20e 40e', False, self.owner))
+        self.assertTrue(Festival.objects.get(name='testest').official)
+        self.assertEqual(sorted(PriceTier.objects.filter(festival=festival).values_list('amount', flat=True)),
+                         [20, 40])
+        self.assertEqual(list(filter_festivals(Festival.objects.all(), {'search': 'metal'})
+                              .values_list('name', flat=True)), ['testest'])
+        self.assertEqual(Concert.objects.get(artist='artist1').festival, festival)
+        self.assertEqual(Concert.objects.get(artist='artist2').festival.name, 'testest')
+        self.assertIn('Imported 2 festivals, skipped 0', output.getvalue())
+        self.assertIn('Imported 2 concerts, skipped 0', output.getvalue())
+
+    def test_import_jsonl_in_batches(self):
+        """
+        import_catalogue is to import JSON Lines files in batches, referring to festivals
+        imported earlier, and to skip the invalid and duplicate records
+        """
+
+        existing = create_festival('existing', self.owner)
+        existing.save()
+        create_concert(existing, 'taken')
+        lines = [json.dumps({'name': 'test{0}'.format(index)}) for index in range(5)]
+        lines += [json.dumps({'name': 'test0'}), json.dumps({'name': 'x' * 256}), 'not json', '[]']
+        festivals = self.write_file('festivals.jsonl', '\n'.join(lines) + '\n')
+        lines = [json.dumps({'festival': 'existing', 'artist': 'artist1', 'start': 1444000000, 'end': 1444003600}),
+                 json.dumps({'festival': 'test4', 'artist': 'artist2', 'start': 1444000000, 'end': 1444003600}),
+                 json.dumps({'festival': 'test4', 'artist': 'taken', 'start': 1444000000, 'end': 1444003600}),
+                 json.dumps({'festival': 'missing', 'artist': 'artist3', 'start': 1444000000, 'end': 1444003600}),
+                 json.dumps({'festival': 'test4', 'artist': 'artist4', 'start': 'soon', 'end': 1444003600})]
+        concerts = self.write_file('concerts.jsonl', '\n'.join(lines) + '\n')
+        output = StringIO()
+        call_command('import_catalogue', festivals=festivals, concerts=concerts, owner='user', batch_size=2,
+                     stdout=output)
+
+        self.assertEqual(Festival.objects.count(), 6)
+        self.assertEqual(sorted(Concert.objects.values_list('artist', flat=True)), ['artist1', 'artist2', 'taken'])
+        self.assertEqual(Concert.objects.get(artist='artist2').festival.name, 'test4')
+        self.assertIn('Imported 5 festivals, skipped 4', output.getvalue())
+        self.assertIn('Imported 2 concerts, skipped 3', output.getvalue())
+
+    def test_incorrect_arguments(self):
+        """
+        import_catalogue is to refuse to run without files, or without an existing owner for festivals
+        """
+
+        festivals = self.write_file('festivals.csv', 'name\ntest\n')
+        with self.assertRaises(CommandError):
+            call_command('import_catalogue')
+        with self.assertRaises(CommandError):
+            call_command('import_catalogue', festivals=festivals)
+        with self.assertRaises(CommandError):
+            call_command('import_catalogue', festivals=festivals, owner='nobody')
+        self.assertEqual(Festival.objects.count(), 0)
@@ -62,3 +62,43 @@ class ReadConcertInfoTests(TestCase):
         data = json.loads(response.content.decode('utf-8'))
         self.assertTrue(data)
         self.assertTrue('test', data['artist'])
+        self.assertEqual(data['id'], concert.pk)
+
+    def test_fields(self):
+        """
+        read_concert_info() is to return only the fields requested, and
+        "Incorrect input" if any of them is not recognised
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        concert = create_concert(festival, 'test')
+        response = self.client.post('/backend/r/conc/', {'client': 'test', 'id': concert.pk,
+                                                         'fields': 'artist,scene'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data, {'artist': 'test', 'scene': 1})
+        response = self.client.post('/backend/r/conc/', {'client': 'test', 'id': concert.pk,
+                                                         'fields': 'description'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+
+    def test_conditional_request(self):
+        """
+        read_concert_info() is to answer with 304 Not Modified if the concert has not changed
+        since the date sent by the client
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        concert = create_concert(festival, 'test')
+        response = self.client.post('/backend/r/conc/', {'client': 'test', 'id': concert.pk})
+        last_modified = response['Last-Modified']
+        response = self.client.post('/backend/r/conc/', {'client': 'test', 'id': concert.pk},
+                                    HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.post('/backend/r/conc/', {'client': 'test', 'id': concert.pk},
+                                    HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 2015 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,75 @@
+import json
+
+from django.test import TestCase
+
+from backend.tests.helpers import login, create_festival, create_user, create_concert
+from backend.tests.helpers import create_client
+
+
+class ReadConcertsBatchTests(TestCase):
+    def test_no_client_name_provided(self):
+        """
+        read_concerts_batch() is to return "Client name not provided"
+        if no client name is provided
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/r/conc/batch/', {'ids': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Client name not provided')
+
+    def test_no_permissions(self):
+        """
+        read_concerts_batch() should return "Permission not granted"
+        if the permissions necessary are not granted
+        """
+
+        login(self.client)
+
+        client = create_client('test')
+        client.read_access = False
+        client.save()
+        response = self.client.post('/backend/r/conc/batch/', {'client': 'test', 'ids': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Permission not granted')
+
+    def test_concerts_found(self):
+        """
+        read_concerts_batch() is to return the concerts by ID, with null for the IDs not found
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        concert1 = create_concert(festival, 'test')
+        concert2 = create_concert(festival, 'testest')
+        ids = '{0},{1},{2}'.format(concert1.pk, concert2.pk, concert1.pk + concert2.pk)
+        response = self.client.post('/backend/r/conc/batch/', {'client': 'test', 'ids': ids,
+                                                               'fields': 'artist'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data, {str(concert1.pk): {'artist': 'test'},
+                                str(concert2.pk): {'artist': 'testest'},
+                                str(concert1.pk + concert2.pk): None})
+
+    def test_same_keys_as_single_read(self):
+        """
+        read_concerts_batch() is to name the fields of each concert as read_concert_info() does
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        concert = create_concert(festival, 'test')
+        single = self.client.post('/backend/r/conc/', {'client': 'test', 'id': concert.pk})
+        batch = self.client.post('/backend/r/conc/batch/', {'client': 'test', 'ids': str(concert.pk)})
+        data = json.loads(batch.content.decode('utf-8'))[str(concert.pk)]
+        self.assertEqual(data, json.loads(single.content.decode('utf-8')))
+        self.assertIn('scene', data)
+        self.assertNotIn('stage', data)
+        batch = self.client.post('/backend/r/conc/batch/', {'client': 'test', 'ids': str(concert.pk),
+                                                            'fields': 'artist,scene'})
+        self.assertEqual(json.loads(batch.content.decode('utf-8'))[str(concert.pk)],
+                         {'artist': 'test', 'scene': concert.stage})
@@ -0,0 +1,109 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from backend.models import Festival
+from backend.tests.helpers import login, create_festival, create_user, create_concert
+from backend.tests.helpers import create_client
+
+
+class ReadFestivalBundleTests(TestCase):
+    def test_no_client_name_provided(self):
+        """
+        read_festival_bundle() is to return "Client name not provided"
+        if no client name is provided
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/r/bundle/', {'id': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Client name not provided')
+
+    def test_no_permissions(self):
+        """
+        read_festival_bundle() should return "Permission not granted"
+        if the permissions necessary are not granted
+        """
+
+        login(self.client)
+
+        client = create_client('test')
+        client.read_access = False
+        client.save()
+        response = self.client.post('/backend/r/bundle/', {'client': 'test', 'id': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Permission not granted')
+
+    def test_no_festival_found(self):
+        """
+        read_festival_bundle() is to return "Invalid Festival ID" if festival is not found
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/r/bundle/', {'client': 'test', 'id': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Invalid Festival ID')
+
+    def test_festival_found(self):
+        """
+        read_festival_bundle() is to return the festival's information and its lineup,
+        grouped by day and stage
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        concert = create_concert(festival, 'first')
+        concert.day = 2
+        concert.stage = 3
+        concert.save()
+        create_concert(festival, 'second')
+        response = self.client.post('/backend/r/bundle/', {'client': 'test', 'id': festival.pk})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['name'], 'test')
+        self.assertEqual(data['uploader'], 'user')
+        self.assertEqual(list(data['lineup'].keys()), ['1', '2'])
+        self.assertEqual([concert['artist'] for concert in data['lineup']['1']['1']], ['second'])
+        self.assertEqual([concert['artist'] for concert in data['lineup']['2']['3']], ['first'])
+
+    def test_query_count(self):
+        """
+        read_festival_bundle() is to run the same number of queries whatever the size of the lineup
+        """
+
+        login(self.client)
+
+        create_client('test')
+        festival = create_festival('test', create_user())
+        festival.save()
+        query_counts = []
+        for concerts in (1, 10):
+            for i in range(concerts):
+                create_concert(festival, 'artist{0}-{1}'.format(concerts, i))
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post('/backend/r/bundle/', {'client': 'test', 'id': festival.pk})
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_modified_by_downloads(self):
+        """
+        read_festival_bundle() is to change its ETag when downloads of the festival are recorded,
+        as the bundle includes their number
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        response = self.client.post('/backend/r/bundle/', {'client': 'test', 'id': festival.pk})
+        etag = response['ETag']
+        Festival.objects.filter(pk=festival.pk).update(download_count=5)
+        response = self.client.post('/backend/r/bundle/', {'client': 'test', 'id': festival.pk},
+                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['downloads'], 5)
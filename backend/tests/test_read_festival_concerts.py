@@ -1,9 +1,9 @@
-import json
-
 from django.test import TestCase
 
+from backend.models import Festival
+
 from backend.tests.helpers import login, create_festival, create_user, create_concert
-from backend.tests.helpers import create_client
+from backend.tests.helpers import create_client, response_json
 
 
 class ReadFestivalConcertsTests(TestCase):
@@ -57,7 +57,7 @@ class ReadFestivalConcertsTests(TestCase):
         festival.save()
         response = self.client.post('/backend/mult/conc/', {'client': 'test', 'id': festival.pk})
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.content.decode('utf-8'))
+        data = response_json(response)
         self.assertTrue(not data)
 
     def test_valid_festival(self):
@@ -69,10 +69,66 @@ class ReadFestivalConcertsTests(TestCase):
 
         festival = create_festival('test', create_user())
         festival.save()
-        create_concert(festival, 'test')
-        create_concert(festival, 'testest')
-        create_concert(festival, 'testestest')
+        concerts = [create_concert(festival, 'test'),
+                    create_concert(festival, 'testest'),
+                    create_concert(festival, 'testestest')]
         response = self.client.post('/backend/mult/conc/', {'client': 'test', 'id': festival.pk})
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.content.decode('utf-8'))
+        data = response_json(response)
         self.assertEqual(len(data), 3)
+        self.assertEqual(sorted(concert['id'] for concert in data), sorted(concert.pk for concert in concerts))
+
+    def test_fields(self):
+        """
+        read_festival_concerts() is to return only the fields requested
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        create_concert(festival, 'test')
+        response = self.client.post('/backend/mult/conc/', {'client': 'test', 'id': festival.pk,
+                                                            'fields': 'artist,day'})
+        self.assertEqual(response_json(response), [{'artist': 'test', 'day': 1}])
+
+    def test_conditional_request(self):
+        """
+        read_festival_concerts() is to answer with 304 Not Modified if the ETag sent by the client
+        is still current, and with the lineup once a concert has been added or removed
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        create_concert(festival, 'test')
+        concert = create_concert(festival, 'testest')
+        response = self.client.post('/backend/mult/conc/', {'client': 'test', 'id': festival.pk})
+        etag = response['ETag']
+        response = self.client.post('/backend/mult/conc/', {'client': 'test', 'id': festival.pk},
+                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        concert.delete()
+        response = self.client.post('/backend/mult/conc/', {'client': 'test', 'id': festival.pk},
+                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response_json(response)), 1)
+
+    def test_not_modified_by_downloads(self):
+        """
+        read_festival_concerts() is to keep its ETag when downloads of the festival are recorded,
+        as the lineup does not include them
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        create_concert(festival, 'test')
+        response = self.client.post('/backend/mult/conc/', {'client': 'test', 'id': festival.pk})
+        etag = response['ETag']
+        Festival.objects.filter(pk=festival.pk).update(download_count=5)
+        response = self.client.post('/backend/mult/conc/', {'client': 'test', 'id': festival.pk},
+                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -63,3 +63,42 @@ class ReadFestivalInfoTests(TestCase):
         data = json.loads(response.content.decode('utf-8'))
         self.assertTrue(data)
         self.assertEqual(data['name'], festival.name)
+
+    def test_fields(self):
+        """
+        read_festival_info() is to return only the fields requested
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        response = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk,
+                                                         'fields': 'name,uploader,voters'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data, {'name': 'test', 'uploader': 'user', 'voters': 0})
+
+    def test_conditional_request(self):
+        """
+        read_festival_info() is to answer with 304 Not Modified if the ETag sent by the client
+        is still current, and with the festival once it has changed
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        response = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk})
+        etag = response['ETag']
+        response = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk},
+                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk, 'fields': 'name'},
+                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        festival.description = 'changed'
+        festival.save()
+        response = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk},
+                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['description'], 'changed')
@@ -0,0 +1,97 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from backend.models import Festival
+from backend.tests.helpers import login, create_festival, create_user
+from backend.tests.helpers import create_client
+
+
+class ReadFestivalsBatchTests(TestCase):
+    def test_no_client_name_provided(self):
+        """
+        read_festivals_batch() is to return "Client name not provided"
+        if no client name is provided
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/r/fest/batch/', {'ids': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Client name not provided')
+
+    def test_no_permissions(self):
+        """
+        read_festivals_batch() should return "Permission not granted"
+        if the permissions necessary are not granted
+        """
+
+        login(self.client)
+
+        client = create_client('test')
+        client.read_access = False
+        client.save()
+        response = self.client.post('/backend/r/fest/batch/', {'client': 'test', 'ids': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Permission not granted')
+
+    def test_invalid_ids(self):
+        """
+        read_festivals_batch() is to return "Incorrect input" if the IDs are missing, not numbers
+        or more than the maximum batch size
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/r/fest/batch/', {'client': 'test'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+        response = self.client.post('/backend/r/fest/batch/', {'client': 'test', 'ids': '1,a'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+        with self.settings(FESTPAL_MAX_BATCH_SIZE=2):
+            response = self.client.post('/backend/r/fest/batch/', {'client': 'test', 'ids': '1,2,3'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+
+    def test_festivals_found(self):
+        """
+        read_festivals_batch() is to return the festivals by ID, with null for the IDs not found,
+        using a single query for the festivals
+        """
+
+        login(self.client)
+
+        user = create_user()
+        fest1 = create_festival('test', user)
+        fest1.save()
+        fest2 = create_festival('testest', user)
+        fest2.save()
+        ids = '{0},{1},{2}'.format(fest2.pk, fest2.pk + fest1.pk, fest1.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/backend/r/fest/batch/', {'client': 'test', 'ids': ids})
+        festival_table = 'FROM ' + connection.ops.quote_name(Festival._meta.db_table)
+        festival_queries = [query for query in queries if festival_table in query['sql']]
+        self.assertEqual(len(festival_queries), 1)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(list(data.keys()), ids.split(','))
+        self.assertEqual(data[str(fest1.pk)]['name'], 'test')
+        self.assertEqual(data[str(fest2.pk)]['name'], 'testest')
+        self.assertIsNone(data[str(fest2.pk + fest1.pk)])
+
+    def test_same_keys_as_single_read(self):
+        """
+        read_festivals_batch() is to name the fields of each festival as read_festival_info() does
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        single = self.client.post('/backend/r/fest/', {'client': 'test', 'id': festival.pk})
+        batch = self.client.post('/backend/r/fest/batch/', {'client': 'test', 'ids': str(festival.pk)})
+        data = json.loads(batch.content.decode('utf-8'))[str(festival.pk)]
+        self.assertEqual(data, json.loads(single.content.decode('utf-8')))
+        self.assertEqual(data['voters'], 0)
+        batch = self.client.post('/backend/r/fest/batch/', {'client': 'test', 'ids': str(festival.pk),
+                                                            'fields': 'name,voters'})
+        self.assertEqual(json.loads(batch.content.decode('utf-8'))[str(festival.pk)], {'name': 'test', 'voters': 0})
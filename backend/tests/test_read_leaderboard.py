@@ -0,0 +1,132 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from backend.models import Festival
+from backend.tests.helpers import login, create_festival, create_user
+from backend.tests.helpers import create_client
+
+
+class ReadLeaderboardTests(TestCase):
+    def setUp(self):
+        owner = create_user()
+        self.festivals = []
+        for name, country, votes, downloads in (('test1', 'Bulgaria', 2, 5), ('test2', 'Spain', 7, 1),
+                                                ('test3', 'Bulgaria', 4, 0), ('test4', 'Bulgaria', 0, 3)):
+            festival = create_festival(name, owner)
+            festival.country = country
+            festival.save()
+            Festival.objects.filter(pk=festival.pk).update(vote_count=votes, download_count=downloads)
+            self.festivals.append(festival)
+
+    def test_no_client_name_provided(self):
+        """
+        read_leaderboard() is to return "Client name not provided"
+        if no client name is provided
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/top/', {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Client name not provided')
+
+    def test_no_permissions(self):
+        """
+        read_leaderboard() should return "Permission not granted"
+        if the permissions necessary are not granted
+        """
+
+        login(self.client)
+
+        client = create_client('test')
+        client.read_access = False
+        client.save()
+        response = self.client.post('/backend/top/', {'client': 'test'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Permission not granted')
+
+    def test_incorrect_input(self):
+        """
+        read_leaderboard() is to return "Incorrect input" for an unknown ranking or an invalid number
+        """
+
+        login(self.client)
+
+        for parameters in ({'by': 'name'}, {'num': 'ten'}, {'num': '1000'}, {'fields': 'nope'}):
+            parameters['client'] = 'test'
+            response = self.client.post('/backend/top/', parameters)
+            self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+
+    @override_settings(FESTPAL_LEADERBOARD_SIZE=2, FESTPAL_MAX_BATCH_SIZE=100)
+    def test_leaderboard_size(self):
+        """
+        read_leaderboard() is to return at most FESTPAL_LEADERBOARD_SIZE festivals
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/top/', {'client': 'test', 'num': '3'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+        response = self.client.post('/backend/top/', {'client': 'test', 'num': '2'})
+        self.assertEqual(len(json.loads(response.content.decode('utf-8'))), 2)
+
+    def test_most_voted(self):
+        """
+        read_leaderboard() is to return the most voted festivals first, by default
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/top/', {'client': 'test', 'num': '3', 'fields': 'name,votes'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data, [{'name': 'test2', 'votes': 7}, {'name': 'test3', 'votes': 4},
+                                {'name': 'test1', 'votes': 2}])
+
+    def test_most_downloaded_in_country(self):
+        """
+        read_leaderboard() is to rank by downloads within a country when asked to,
+        without aggregating votes or downloads
+        """
+
+        login(self.client)
+
+        create_client('test')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/backend/top/', {'client': 'test', 'by': 'downloads',
+                                                          'country': 'Bulgaria', 'fields': 'name'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([festival['name'] for festival in data], ['test1', 'test4', 'test3'])
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql'].upper()])
+
+    def test_votes_update_ranking(self):
+        """
+        vote() is to move a festival up the leaderboard straight away
+        """
+
+        login(self.client)
+
+        client = create_client('test')
+        client.vote_access = True
+        client.save()
+        Festival.objects.filter(pk=self.festivals[0].pk).update(vote_count=7)
+        self.client.post('/backend/v/', {'client': 'test', 'id': self.festivals[0].pk})
+        response = self.client.post('/backend/top/', {'client': 'test', 'num': '1', 'fields': 'name'})
+        self.assertEqual(json.loads(response.content.decode('utf-8')), [{'name': 'test1'}])
+
+    def test_rebuild_leaderboard(self):
+        """
+        rebuild_leaderboard is to recompute the vote and download counts from the voters and downloads
+        """
+
+        voter = User.objects.create(username='voter')
+        Festival.voters.through.objects.create(festival_id=self.festivals[3].pk, user_id=voter.pk)
+        Festival.downloads.through.objects.create(festival_id=self.festivals[3].pk, user_id=voter.pk)
+        call_command('rebuild_leaderboard', stdout=StringIO())
+        self.assertEqual(list(Festival.objects.order_by('pk').values_list('vote_count', 'download_count')),
+                         [(0, 0), (0, 0), (0, 0), (1, 1)])
@@ -1,9 +1,11 @@
-import json
+from unittest.mock import patch
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from backend.tests.helpers import login, create_festival, create_user
-from backend.tests.helpers import create_client
+from backend.tests.helpers import login, create_festival, create_user, create_concert
+from backend.tests.helpers import create_client, response_json
 
 
 class ReadMultipleFestivalsTests(TestCase):
@@ -44,7 +46,7 @@ class ReadMultipleFestivalsTests(TestCase):
 
         response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3})
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.content.decode('utf-8'))
+        data = response_json(response)
         self.assertTrue(not data)
 
     def test_less_records_available_than_requested(self):
@@ -59,7 +61,7 @@ class ReadMultipleFestivalsTests(TestCase):
         fest.save()
         response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3})
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.content.decode('utf-8'))
+        data = response_json(response)
         self.assertEqual(len(data), 1)
 
     def test_records_available_equal_or_more_than_requested(self):
@@ -79,12 +81,12 @@ class ReadMultipleFestivalsTests(TestCase):
         fest3.save()
         response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3})
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.content.decode('utf-8'))
+        data = response_json(response)
         self.assertEqual(len(data), 3)
         create_festival('testestestest', user)
         response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3})
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.content.decode('utf-8'))
+        data = response_json(response)
         self.assertEqual(len(data), 3)
 
     def test_filter_does_not_satisfy_any_results(self):
@@ -103,7 +105,7 @@ class ReadMultipleFestivalsTests(TestCase):
             'country': 'test',
             'city': 'asdf'
         })
-        data = json.loads(response.content.decode('utf-8'))
+        data = response_json(response)
         self.assertEqual(len(data), 0)
 
     def test_filter_satisfied_results(self):
@@ -132,5 +134,293 @@ class ReadMultipleFestivalsTests(TestCase):
             'min_price': '20e',
             'max_price': '60e'
         })
-        data = json.loads(response.content.decode('utf-8'))
+        data = response_json(response)
         self.assertEqual(len(data), 2)
+
+    def test_num_counts_matching_results(self):
+        """
+        read_multiple_festivals() is to return up to num festivals satisfying the filter,
+        regardless of how many non-matching festivals precede them
+        """
+
+        login(self.client)
+
+        user = create_user()
+        create_festival('first', user).save()
+        create_festival('second', user).save()
+        fest = create_festival('third', user)
+        fest.city = 'testcity'
+        fest.save()
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 1, 'city': 'testcity'})
+        data = response_json(response)
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['name'], 'third')
+
+    def test_price_filter_other_currency(self):
+        """
+        read_multiple_festivals() is to skip festivals priced in a different currency
+        than the one of the price filter
+        """
+
+        login(self.client)
+
+        user = create_user()
+        fest1 = create_festival('test', user)
+        fest1.prices = '$30'
+        fest1.save()
+        fest2 = create_festival('testest', user)
+        fest2.prices = '30e'
+        fest2.save()
+        response = self.client.post('/backend/mult/fest/', {
+            'client': 'test',
+            'num': 3,
+            'min_price': '20e',
+            'max_price': '60e'
+        })
+        data = response_json(response)
+        self.assertEqual([festival['name'] for festival in data], ['testest'])
+
+    def test_artist_filter(self):
+        """
+        read_multiple_festivals() is to return only the festivals with a concert
+        of an artist matching the filter
+        """
+
+        login(self.client)
+
+        user = create_user()
+        fest1 = create_festival('test', user)
+        fest1.save()
+        create_concert(fest1, 'someartist')
+        fest2 = create_festival('testest', user)
+        fest2.save()
+        create_concert(fest2, 'otherband')
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3, 'artist': 'artist'})
+        data = response_json(response)
+        self.assertEqual([festival['name'] for festival in data], ['test'])
+
+    def test_artist_filter_query_count(self):
+        """
+        read_multiple_festivals() is to run the same number of queries for the artist filter
+        no matter how many festivals there are
+        """
+
+        login(self.client)
+
+        create_client('test')
+        user = create_user()
+        fest = create_festival('test', user)
+        fest.save()
+        create_concert(fest, 'someartist')
+        query_counts = []
+        for festivals_added in (2, 20):
+            for i in range(festivals_added):
+                other = create_festival('other{0}-{1}'.format(festivals_added, i), user)
+                other.save()
+                create_concert(other, 'otherband{0}-{1}'.format(festivals_added, i))
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 30, 'artist': 'artist'})
+                data = response_json(response)
+            self.assertEqual(len(data), 1)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_query_count_independent_of_page_size(self):
+        """
+        read_multiple_festivals() is to serialize a page of festivals, with their owners,
+        votes and downloads, in a fixed number of queries
+        """
+
+        login(self.client)
+
+        create_client('test')
+        voter = create_user()
+        query_counts = []
+        for num in (1, 10):
+            for i in range(num):
+                festival = create_festival('test{0}-{1}'.format(num, i), voter)
+                festival.save()
+                festival.voters.add(voter)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': num})
+                data = response_json(response)
+            self.assertEqual(len(data), num)
+            self.assertEqual(data[0]['votes'], 1)
+            self.assertEqual(data[0]['uploader'], 'user')
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_cursor_pagination(self):
+        """
+        read_multiple_festivals() is to return a cursor with every full page, which
+        continues the listing after the last festival of that page
+        """
+
+        login(self.client)
+
+        user = create_user()
+        for name in ('d', 'b', 'e', 'a', 'c'):
+            create_festival(name, user).save()
+        names = []
+        params = {'client': 'test', 'num': 2, 'order': 'name'}
+        while True:
+            response = self.client.post('/backend/mult/fest/', params)
+            names += [festival['name'] for festival in response_json(response)]
+            if not response.has_header('X-Next-Cursor'):
+                break
+            params['cursor'] = response['X-Next-Cursor']
+        self.assertEqual(names, ['a', 'b', 'c', 'd', 'e'])
+
+    def test_invalid_cursor(self):
+        """
+        read_multiple_festivals() is to return "Incorrect input" if the cursor was tampered with
+        or was issued for a different order
+        """
+
+        login(self.client)
+
+        user = create_user()
+        create_festival('test', user).save()
+        create_festival('testest', user).save()
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 1, 'order': '-name'})
+        cursor = response['X-Next-Cursor']
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 1, 'cursor': cursor})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 1, 'order': '-name',
+                                                            'cursor': cursor + 'x'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+
+    def test_cursor_pagination_by_date(self):
+        """
+        read_multiple_festivals() is to page through festivals ordered by a date field
+        """
+
+        login(self.client)
+
+        user = create_user()
+        for name in ('a', 'b', 'c'):
+            create_festival(name, user).save()
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 2, 'order': '-first_uploaded'})
+        first_page = [festival['name'] for festival in response_json(response)]
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 2, 'order': '-first_uploaded',
+                                                            'cursor': response['X-Next-Cursor']})
+        second_page = [festival['name'] for festival in response_json(response)]
+        self.assertEqual(first_page + second_page, ['c', 'b', 'a'])
+
+    def test_search(self):
+        """
+        read_multiple_festivals() is to return the festivals matching every word of the search
+        query as a prefix, the most relevant first
+        """
+
+        login(self.client)
+
+        user = create_user()
+        fest1 = create_festival('Summer Jazz Days', user)
+        fest1.description = 'A weekend by the sea'
+        fest1.save()
+        fest2 = create_festival('Metal Mayhem', user)
+        fest2.description = 'Heavy metal and thrash metal bands'
+        fest2.genre = 'metal'
+        fest2.save()
+        fest3 = create_festival('Sea Sounds', user)
+        fest3.description = 'Some metal, mostly rock'
+        fest3.save()
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3, 'search': 'meta'})
+        data = response_json(response)
+        self.assertEqual([festival['name'] for festival in data], ['Metal Mayhem', 'Sea Sounds'])
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3, 'search': 'jazz wee'})
+        data = response_json(response)
+        self.assertEqual([festival['name'] for festival in data], ['Summer Jazz Days'])
+
+    def test_search_without_words(self):
+        """
+        read_multiple_festivals() is to return no festivals for a search query without words
+        """
+
+        login(self.client)
+
+        create_festival('Summer Jazz Days', create_user()).save()
+        for query in ('', '!!!'):
+            response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3, 'search': query})
+            self.assertEqual(response_json(response), [])
+
+    def test_search_pages(self):
+        """
+        read_multiple_festivals() is to return search results page by page, following the cursor
+        """
+
+        login(self.client)
+
+        user = create_user()
+        for name in ('Jazz One', 'Jazz Two', 'Jazz Three'):
+            create_festival(name, user).save()
+        params = {'client': 'test', 'num': 2, 'search': 'jazz'}
+        response = self.client.post('/backend/mult/fest/', params)
+        names = [festival['name'] for festival in response_json(response)]
+        params['cursor'] = response['X-Next-Cursor']
+        response = self.client.post('/backend/mult/fest/', params)
+        names += [festival['name'] for festival in response_json(response)]
+        self.assertFalse(response.has_header('X-Next-Cursor'))
+        self.assertEqual(sorted(names), ['Jazz One', 'Jazz Three', 'Jazz Two'])
+        params['search'] = 'blues'
+        response = self.client.post('/backend/mult/fest/', params)
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+
+    def test_search_index_follows_changes(self):
+        """
+        read_multiple_festivals() is to search the current name, description and genre of
+        festivals, and not return deleted festivals
+        """
+
+        login(self.client)
+
+        fest = create_festival('Summer Jazz Days', create_user())
+        fest.save()
+        fest.name = 'Winter Blues Nights'
+        fest.save()
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3, 'search': 'jazz'})
+        self.assertEqual(response_json(response), [])
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3, 'search': 'blues'})
+        self.assertEqual(len(response_json(response)), 1)
+        fest.delete()
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 3, 'search': 'blues'})
+        self.assertEqual(response_json(response), [])
+
+    def test_streamed_in_chunks(self):
+        """
+        read_multiple_festivals() is to stream the festivals as one JSON array, fetched
+        in chunks of bounded size
+        """
+
+        login(self.client)
+
+        user = create_user()
+        for i in range(5):
+            create_festival('test{0}'.format(i), user).save()
+        with patch('backend.pagination.CHUNK_SIZE', 2):
+            response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 4})
+            self.assertTrue(response.streaming)
+            data = response_json(response)
+        self.assertEqual([festival['name'] for festival in data], ['test0', 'test1', 'test2', 'test3'])
+
+    def test_fields(self):
+        """
+        read_multiple_festivals() is to return only the fields requested, and
+        "Incorrect input" if any of them is not recognised
+        """
+
+        login(self.client)
+
+        user = create_user()
+        create_festival('test', user).save()
+        create_festival('testest', user).save()
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 1, 'order': 'name',
+                                                            'fields': 'id,name,votes'})
+        data = response_json(response)
+        self.assertEqual(list(data[0].keys()), ['id', 'name', 'votes'])
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 1, 'order': 'name',
+                                                            'fields': 'name', 'cursor': response['X-Next-Cursor']})
+        self.assertEqual(response_json(response), [{'name': 'testest'}])
+        response = self.client.post('/backend/mult/fest/', {'client': 'test', 'num': 1, 'fields': 'name,owner'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
@@ -0,0 +1,45 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from backend.filters import filter_price_range
+from backend.models import Festival, PriceTier
+from backend.tests.helpers import create_festival, create_user
+
+
+class RebuildPriceTiersTests(TestCase):
+    def test_rebuild(self):
+        """
+        rebuild_price_tiers is to store the price tiers of festivals saved without them,
+        and replace those that no longer match the prices
+        """
+
+        user = create_user()
+        for index, prices in enumerate(('20e 40e', '', '$15')):
+            festival = create_festival('test{0}'.format(index), user)
+            festival.prices = prices
+            festival.save()
+        # Stored before price tiers were, or changed without saving the festival
+        Festival.objects.filter(name='test1').update(prices='5e')
+        PriceTier.objects.filter(festival__name='test0').delete()
+        PriceTier.objects.create(festival=Festival.objects.get(name='test2'), amount=99, currency='$')
+
+        out = StringIO()
+        call_command('rebuild_price_tiers', chunk_size=2, stdout=out)
+        self.assertIn('Rebuilt the price tiers of 3 festivals', out.getvalue())
+        self.assertEqual(sorted(PriceTier.objects.values_list('festival__name', 'amount', 'currency')),
+                         [('test0', 20, 'e'), ('test0', 40, 'e'), ('test1', 5, 'e'), ('test2', 15, '$')])
+
+    def test_price_range_filter(self):
+        """
+        The price range filter is to find festivals stored before price tiers once they have been rebuilt
+        """
+
+        festival = create_festival('test', create_user())
+        festival.prices = '20e'
+        festival.save()
+        PriceTier.objects.all().delete()
+        self.assertEqual(list(filter_price_range(Festival.objects.all(), max_price='30e')), [])
+        call_command('rebuild_price_tiers', stdout=StringIO())
+        self.assertEqual(list(filter_price_range(Festival.objects.all(), max_price='30e')), [festival])
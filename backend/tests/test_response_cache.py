@@ -0,0 +1,98 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from backend import response_cache
+from backend.conditional import festival_validators
+from backend.models import Festival, Concert
+from backend.tests.helpers import login, create_festival, create_user, create_concert, response_json
+from backend.tests.helpers import create_client
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.festival = create_festival('test', create_user())
+        self.festival.save()
+        create_concert(self.festival, 'test')
+
+    def queries_on(self, model, queries):
+        table = connection.ops.quote_name(model._meta.db_table)
+        return [query for query in queries.captured_queries if table in query['sql']]
+
+    def test_festival_info_cached(self):
+        """
+        read_festival_info() is to serve a festival from the cache once it has been serialized,
+        with only the query of its validators
+        """
+
+        login(self.client)
+
+        create_client('test')
+        first = self.client.post('/backend/r/fest/', {'client': 'test', 'id': self.festival.pk})
+        hits = response_cache.stats()['local_hits']
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.post('/backend/r/fest/', {'client': 'test', 'id': self.festival.pk})
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(response_cache.stats()['local_hits'], hits + 1)
+        self.assertEqual(len(self.queries_on(Festival, queries)), 1)
+
+    def test_lineup_cached(self):
+        """
+        read_festival_concerts() is to serve a lineup from the cache once it has been streamed
+        """
+
+        login(self.client)
+
+        create_client('test')
+        first = response_json(self.client.post('/backend/mult/conc/', {'client': 'test', 'id': self.festival.pk}))
+        hits = response_cache.stats()['local_hits']
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.post('/backend/mult/conc/', {'client': 'test', 'id': self.festival.pk})
+            second = response_json(second)
+        self.assertEqual(first, second)
+        self.assertEqual(response_cache.stats()['local_hits'], hits + 1)
+        # Only the aggregate of the validators reads the concerts
+        self.assertEqual(len(self.queries_on(Concert, queries)), 1)
+
+    def test_writes_invalidate(self):
+        """
+        Writes to a festival or its concerts are to drop its cached responses
+        """
+
+        user = login(self.client)
+
+        client = create_client('test')
+        client.write_access = True
+        client.save()
+        self.festival.owner = user
+        self.festival.save()
+        self.client.post('/backend/mult/conc/', {'client': 'test', 'id': self.festival.pk})
+        self.client.post('/backend/w/conc/', {'client': 'test', 'festival': self.festival.pk, 'artist': 'testest',
+                                              'start': '1444000000', 'end': '1444003600'})
+        data = response_json(self.client.post('/backend/mult/conc/', {'client': 'test', 'id': self.festival.pk}))
+        self.assertEqual(sorted(concert['artist'] for concert in data), ['test', 'testest'])
+
+    def test_invalidate_festival(self):
+        """
+        invalidate_festival() is to make the cached responses of a festival unreachable
+        """
+        validators = festival_validators(self.festival.pk)
+        response_cache.store_response('festival', self.festival.pk, validators, 'body')
+        self.assertEqual(response_cache.get_response('festival', self.festival.pk, validators), 'body')
+        response_cache.invalidate_festival(self.festival.pk)
+        self.assertEqual(response_cache.get_response('festival', self.festival.pk, validators), None)
+        response_cache.store_response('festival', self.festival.pk, validators, 'body')
+        response_cache.invalidate_festival(self.festival.pk)
+        self.assertEqual(response_cache.get_response('festival', self.festival.pk, validators), None)
+
+    def test_admin_stats(self):
+        """
+        The festival list of the admin is to show the hit and miss counts of the response cache
+        """
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        stats = response_cache.stats()
+        response = self.client.get('/admin/backend/festival/')
+        self.assertContains(response, '{0} local hits, {1} shared hits'.format(stats['local_hits'],
+                                                                                stats['shared_hits']))
@@ -0,0 +1,139 @@
+import datetime
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from backend.models import Festival, Tombstone
+from backend.sync import make_sync_token, SYNC_MARGIN
+from backend.tests.helpers import login, create_festival, create_user, create_concert
+from backend.tests.helpers import create_client, response_json
+
+
+class SyncTests(TestCase):
+    def test_no_client_name_provided(self):
+        """
+        sync() is to return "Client name not provided"
+        if no client name is provided
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/sync/', {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Client name not provided')
+
+    def test_no_permissions(self):
+        """
+        sync() should return "Permission not granted"
+        if the permissions necessary are not granted
+        """
+
+        login(self.client)
+
+        client = create_client('test')
+        client.read_access = False
+        client.save()
+        response = self.client.post('/backend/sync/', {'client': 'test'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Permission not granted')
+
+    def test_invalid_token(self):
+        """
+        sync() is to return "Incorrect input" if the token is not one it has issued
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/sync/', {'client': 'test', 'since': 'yesterday'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+
+    @override_settings(FESTPAL_TOMBSTONE_RETENTION=3600)
+    def test_expired_token(self):
+        """
+        sync() is to return "Incorrect input" if the token is older than the deletions kept,
+        so that the client does a full sync
+        """
+
+        login(self.client)
+
+        token = make_sync_token(timezone.now() - datetime.timedelta(hours=2))
+        response = self.client.post('/backend/sync/', {'client': 'test', 'since': token})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+
+    @override_settings(FESTPAL_TOMBSTONE_RETENTION=3600)
+    def test_prune_tombstones(self):
+        """
+        prune_tombstones is to delete only the tombstones older than FESTPAL_TOMBSTONE_RETENTION
+        """
+        old = Tombstone.objects.create(model='festival', object_id=1)
+        Tombstone.objects.filter(pk=old.pk).update(deleted=timezone.now() - datetime.timedelta(hours=2))
+        recent = Tombstone.objects.create(model='festival', object_id=2)
+        output = StringIO()
+        call_command('prune_tombstones', stdout=output)
+        self.assertEqual(output.getvalue().strip(), 'Pruned 1 tombstones')
+        self.assertEqual(list(Tombstone.objects.all()), [recent])
+
+    def test_full_sync(self):
+        """
+        sync() is to return every festival and concert, and a token, if no token is provided
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        create_concert(festival, 'test')
+        response = self.client.post('/backend/sync/', {'client': 'test'})
+        data = response_json(response)
+        self.assertEqual([festival['name'] for festival in data['festivals']], ['test'])
+        self.assertEqual([concert['artist'] for concert in data['concerts']], ['test'])
+        self.assertEqual(data['deleted'], {'festivals': [], 'concerts': []})
+        self.assertTrue(data['token'])
+
+    def test_changes_since_token(self):
+        """
+        sync() is to return only the festivals and concerts changed after the token,
+        and the ones deleted since
+        """
+
+        login(self.client)
+
+        user = create_user()
+        unchanged = create_festival('unchanged', user)
+        unchanged.save()
+        changed = create_festival('changed', user)
+        changed.save()
+        deleted = create_festival('deleted', user)
+        deleted.save()
+        concert = create_concert(deleted, 'test')
+        Festival.objects.all().update(last_modified=timezone.now() - 2 * SYNC_MARGIN)
+        token = make_sync_token(timezone.now())
+
+        changed.description = 'changed'
+        changed.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+        response = self.client.post('/backend/sync/', {'client': 'test', 'since': token})
+        data = response_json(response)
+        self.assertEqual([festival['name'] for festival in data['festivals']], ['changed'])
+        self.assertEqual(data['deleted'], {'festivals': [deleted_pk], 'concerts': [concert.pk]})
+
+    def test_full_sync_streamed(self):
+        """
+        sync() is to stream a full sync, reading the festivals in chunks of bounded size
+        """
+
+        login(self.client)
+
+        user = create_user()
+        for index in range(3):
+            create_festival('test{0}'.format(index), user).save()
+        with patch('backend.pagination.CHUNK_SIZE', 2):
+            response = self.client.post('/backend/sync/', {'client': 'test'})
+            self.assertTrue(response.streaming)
+            data = response_json(response)
+        self.assertEqual([festival['name'] for festival in data['festivals']], ['test0', 'test1', 'test2'])
+        self.assertEqual(data['concerts'], [])
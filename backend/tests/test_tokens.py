@@ -0,0 +1,174 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, Client as TestClient
+from django.test.utils import CaptureQueriesContext
+
+from backend.buffers import download_buffer
+from backend.checks import check_token_cache
+from backend.tests.helpers import create_client, create_festival, response_json
+from backend.tokens import revoke_tokens, user_from_token
+
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        caches[settings.FESTPAL_TOKEN_CACHE].clear()
+        download_buffer.clear()
+        self.user = User.objects.create_user('testuser', password='testpassword')
+        self.festival = create_festival('test', self.user)
+        self.festival.save()
+        create_client('test')
+
+    def tearDown(self):
+        download_buffer.clear()
+
+    def issue_token(self):
+        response = self.client.post('/backend/login/',
+                                    {'username': 'testuser', 'password': 'testpassword', 'token': '1'})
+        return response_json(response)
+
+    def read_festival(self, token):
+        return TestClient().post('/backend/r/fest/', {'client': 'test', 'id': self.festival.pk},
+                                 HTTP_AUTHORIZATION='Bearer ' + token)
+
+    def test_issue_token(self):
+        """
+        log_in() is to return a token and its expiry, without logging the client in, if a token is requested
+        """
+        data = self.issue_token()
+        self.assertIn('token', data)
+        self.assertGreater(data['expires'], time.time())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    def test_authenticated_without_queries(self):
+        """
+        A request with a valid token is to be authenticated without querying the user or a session
+        """
+        token = self.issue_token()['token']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.read_festival(token)
+        self.assertEqual(response_json(response)['name'], 'test')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('FROM "auth_user"', sql)
+        self.assertNotIn('django_session', sql)
+        self.assertNotIn('backend_profile', sql)
+
+    def test_csrf_not_enforced(self):
+        """
+        A request with a valid token is not to need a CSRF token
+        """
+        token = self.issue_token()['token']
+        client = TestClient(enforce_csrf_checks=True)
+        response = client.post('/backend/r/fest/', {'client': 'test', 'id': self.festival.pk},
+                               HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.status_code, 200)
+
+    def test_tampered_token(self):
+        """
+        A request with a token that was changed is not to be authenticated
+        """
+        token = self.issue_token()['token']
+        response = self.read_festival(token[:-1] + ('A' if token[-1] != 'A' else 'B'))
+        self.assertRedirects(response, '/backend/login/', fetch_redirect_response=False)
+
+    def test_expired_token(self):
+        """
+        A request with an expired token is not to be authenticated
+        """
+        data = self.issue_token()
+        with mock.patch('backend.tokens.time.time', return_value=data['expires'] + 1):
+            response = self.read_festival(data['token'])
+        self.assertRedirects(response, '/backend/login/', fetch_redirect_response=False)
+
+    def test_revoked_on_log_out(self):
+        """
+        log_out() with a token is to revoke the tokens issued to the user
+        """
+        token = self.issue_token()['token']
+        response = TestClient().post('/backend/logout/', HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(response.content.decode('utf-8'), 'Logged out')
+        response = self.read_festival(token)
+        self.assertRedirects(response, '/backend/login/', fetch_redirect_response=False)
+
+    def test_revoked_on_disable(self):
+        """
+        Disabling a user is to revoke the tokens issued to them
+        """
+        token = self.issue_token()['token']
+        self.user.is_active = False
+        self.user.save()
+        response = self.read_festival(token)
+        self.assertRedirects(response, '/backend/login/', fetch_redirect_response=False)
+
+    def test_revoked_on_delete(self):
+        """
+        Deleting a user is to revoke the tokens issued to them
+        """
+        token = self.issue_token()['token']
+        self.festival.delete()
+        self.user.delete()
+        response = self.read_festival(token)
+        self.assertRedirects(response, '/backend/login/', fetch_redirect_response=False)
+
+    def test_revoked_on_password_change(self):
+        """
+        Changing the password of a user is to revoke the tokens issued to them
+        """
+        token = self.issue_token()['token']
+        self.user.set_password('newpassword')
+        self.user.save()
+        response = self.read_festival(token)
+        self.assertRedirects(response, '/backend/login/', fetch_redirect_response=False)
+
+    def test_kept_after_password_change(self):
+        """
+        Saving a user again after changing the password is to keep the tokens issued since then valid
+        """
+        self.user.set_password('newpassword')
+        self.user.save()
+        response = self.client.post('/backend/login/',
+                                    {'username': 'testuser', 'password': 'newpassword', 'token': '1'})
+        token = response_json(response)['token']
+        self.user.save(update_fields=['last_login'])
+        response = self.read_festival(token)
+        self.assertEqual(response_json(response)['name'], 'test')
+
+    def test_kept_on_other_changes(self):
+        """
+        Saving a user without changing the password or disabling them is to keep their tokens valid
+        """
+        token = self.issue_token()['token']
+        self.user.email = 'test@example.com'
+        self.user.save()
+        response = self.read_festival(token)
+        self.assertEqual(response_json(response)['name'], 'test')
+
+    def test_revoked_version_cached(self):
+        """
+        revoke_tokens() is to write the new version to the cache, rather than leave it to be read again
+        """
+        token = self.issue_token()['token']
+        revoke_tokens(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertIsNone(user_from_token(token))
+
+
+class TokenCacheCheckTests(TestCase):
+    def test_local_cache(self):
+        """
+        check_token_cache() is to warn if the token cache is not shared between hosts
+        """
+        with self.settings(FESTPAL_TOKEN_CACHE='default'):
+            self.assertEqual([warning.id for warning in check_token_cache(None)], ['backend.W001'])
+
+    def test_shared_cache(self):
+        """
+        check_token_cache() is to accept a cache shared between hosts
+        """
+        shared = {'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache', 'LOCATION': '127.0.0.1:11211'}
+        with self.settings(CACHES=dict(settings.CACHES, shared=shared), FESTPAL_TOKEN_CACHE='shared'):
+            self.assertEqual(check_token_cache(None), [])
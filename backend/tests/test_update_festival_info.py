@@ -1,3 +1,6 @@
+from unittest.mock import patch
+
+from django.db.models import F
 from django.test import TestCase
 
 from backend.models import Festival
@@ -133,3 +136,32 @@ class UpdateFestivalInfoTests(TestCase):
         self.assertEqual(3, len(response_string.split('\n')))
         festival = Festival.objects.get(pk=festival.pk)
         self.assertEqual('testest', festival.city)
+
+    def test_keeps_concurrent_votes(self):
+        """
+        update_festival_info() is not to write back the counters it loaded,
+        so that votes counted while it runs are kept
+        """
+
+        user = login(self.client)
+        client = create_client('test')
+        client.write_access = True
+        client.save()
+
+        festival = create_festival('test', user)
+        festival.save()
+
+        get = Festival.objects.get
+
+        def get_then_vote(*args, **kwargs):
+            loaded = get(*args, **kwargs)
+            Festival.objects.filter(pk=loaded.pk).update(vote_count=F('vote_count') + 1)
+            return loaded
+
+        with patch.object(Festival.objects, 'get', side_effect=get_then_vote):
+            response = self.client.post('/backend/u/fest/', {'client': 'test', 'id': festival.pk, 'city': 'testest'})
+
+        self.assertEqual('city:testest\n', response.content.decode('utf-8'))
+        festival = Festival.objects.get(pk=festival.pk)
+        self.assertEqual('testest', festival.city)
+        self.assertEqual(1, festival.vote_count)
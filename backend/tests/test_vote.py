@@ -1,5 +1,10 @@
+from unittest.mock import patch
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from backend.models import Festival
 from backend.tests.helpers import login, create_festival, create_user
 from backend.tests.helpers import create_client
 
@@ -49,6 +54,28 @@ class VoteTests(TestCase):
         self.assertEqual('Invalid Festival ID', response.content.decode('utf-8'))
         self.assertEqual(0, festival.voters_number())
 
+    def test_festival_deleted_while_voting(self):
+        """
+        vote() is to return "Invalid Festival ID" if the festival is deleted after it was found
+        """
+        login(self.client)
+
+        client = create_client('test')
+        client.vote_access = True
+        client.save()
+        festival = create_festival('test', create_user())
+        festival.save()
+        votes = Festival.voters.through.objects
+        create = votes.create
+
+        def delete_then_vote(**kwargs):
+            Festival.objects.filter(pk=festival.pk).delete()
+            return create(**kwargs)
+
+        with patch.object(votes, 'create', side_effect=delete_then_vote):
+            response = self.client.post('/backend/v/', {'client': 'test', 'id': festival.pk})
+        self.assertEqual('Invalid Festival ID', response.content.decode('utf-8'))
+
     def test_festival_matches(self):
         """
         vote() is to return the number of voters for the festival if festival is found.
@@ -63,3 +90,41 @@ class VoteTests(TestCase):
         festival.save()
         response = self.client.post('/backend/v/', {'client': 'test', 'id': festival.pk})
         self.assertEqual(festival.voters_number(), int(response.content.decode('utf-8')))
+
+    def test_vote_counted_once(self):
+        """
+        vote() is to count the vote of a user only once, however many times the user votes
+        """
+        user = login(self.client)
+
+        client = create_client('test')
+        client.vote_access = True
+        client.save()
+        festival = create_festival('test', create_user())
+        festival.save()
+        response = self.client.post('/backend/v/', {'client': 'test', 'id': festival.pk})
+        self.assertEqual('1', response.content.decode('utf-8'))
+        response = self.client.post('/backend/v/', {'client': 'test', 'id': festival.pk})
+        self.assertEqual('1', response.content.decode('utf-8'))
+        festival.refresh_from_db()
+        self.assertEqual(festival.vote_count, 1)
+        self.assertEqual(list(festival.voters.all()), [user])
+
+    def test_vote_without_count_or_row_rewrite(self):
+        """
+        vote() is to update only the counter of the festival, without counting its voters
+        """
+        login(self.client)
+
+        client = create_client('test')
+        client.vote_access = True
+        client.save()
+        festival = create_festival('test', create_user())
+        festival.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/backend/v/', {'client': 'test', 'id': festival.pk})
+        self.assertEqual('1', response.content.decode('utf-8'))
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql'].upper()])
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn(connection.ops.quote_name('name'), updates[0])
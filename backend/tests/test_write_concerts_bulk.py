@@ -0,0 +1,127 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from backend.models import Concert, Client
+from backend.tests.helpers import login, create_festival, create_user, create_concert
+from backend.tests.helpers import create_client
+
+
+def lineup(*artists):
+    return json.dumps([{'artist': artist, 'stage': 1, 'day': 1, 'start': 1444000000 + index * 3600,
+                        'end': 1444003000 + index * 3600} for index, artist in enumerate(artists)])
+
+
+class WriteConcertsBulkTests(TestCase):
+    def setUp(self):
+        client = create_client('test')
+        client.write_access = True
+        client.save()
+
+    def test_no_client_name_provided(self):
+        """
+        write_concerts_bulk() is to return "Client name not provided"
+        if no client name is provided
+        """
+
+        login(self.client)
+
+        response = self.client.post('/backend/w/conc/bulk/', {'festival': '1', 'concerts': lineup('test')})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Client name not provided')
+
+    def test_no_permissions(self):
+        """
+        write_concerts_bulk() should return "Permission not granted"
+        if the permissions necessary are not granted
+        """
+
+        login(self.client)
+
+        client = Client.objects.get(name='test')
+        client.write_access = False
+        client.save()
+        response = self.client.post('/backend/w/conc/bulk/', {'client': 'test', 'festival': '1',
+                                                              'concerts': lineup('test')})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8'), 'Permission not granted')
+
+    def test_incorrect_input(self):
+        """
+        write_concerts_bulk() is to return "Incorrect input" if the festival does not exist
+        or the concerts are not a JSON array
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        response = self.client.post('/backend/w/conc/bulk/', {'client': 'test', 'festival': festival.pk + 1,
+                                                              'concerts': lineup('test')})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+        response = self.client.post('/backend/w/conc/bulk/', {'client': 'test', 'festival': festival.pk,
+                                                              'concerts': '{"artist": "test"}'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+        response = self.client.post('/backend/w/conc/bulk/', {'client': 'test', 'festival': festival.pk,
+                                                              'concerts': 'test'})
+        self.assertEqual(response.content.decode('utf-8'), 'Incorrect input')
+        self.assertEqual(Concert.objects.count(), 0)
+
+    def test_concerts_written(self):
+        """
+        write_concerts_bulk() is to insert every concert of the lineup and return "OK" for each of them
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        response = self.client.post('/backend/w/conc/bulk/', {'client': 'test', 'festival': festival.pk,
+                                                              'concerts': lineup('test', 'testest', 'tester')})
+        self.assertEqual(json.loads(response.content.decode('utf-8')), ['OK', 'OK', 'OK'])
+        self.assertEqual(list(Concert.objects.filter(festival=festival).order_by('start')
+                              .values_list('artist', flat=True)), ['test', 'testest', 'tester'])
+        concert = Concert.objects.get(artist='testest')
+        self.assertEqual((concert.stage, concert.day), (1, 1))
+
+    def test_nothing_written_on_error(self):
+        """
+        write_concerts_bulk() is to insert none of the concerts if any of them is invalid or
+        its artist exists, reporting the problem of each item
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        create_concert(festival, 'existing')
+        concerts = json.loads(lineup('test', 'existing', 'testest', 'test'))
+        concerts.append({'artist': 'tester', 'start': 'soon', 'end': 1444003000})
+        concerts.append('tester')
+        response = self.client.post('/backend/w/conc/bulk/', {'client': 'test', 'festival': festival.pk,
+                                                              'concerts': json.dumps(concerts)})
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+                         ['Not inserted', 'Artist exists', 'Not inserted', 'Artist exists',
+                          'Incorrect input', 'Incorrect input'])
+        self.assertEqual(list(Concert.objects.values_list('artist', flat=True)), ['existing'])
+
+    def test_artists_checked_in_one_query(self):
+        """
+        write_concerts_bulk() is to look the artists up and insert the concerts
+        with a constant number of queries, whatever the size of the lineup
+        """
+
+        login(self.client)
+
+        festival = create_festival('test', create_user())
+        festival.save()
+        artists = ['test{0}'.format(index) for index in range(50)]
+        table = connection.ops.quote_name(Concert._meta.db_table)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/backend/w/conc/bulk/', {'client': 'test', 'festival': festival.pk,
+                                                                  'concerts': lineup(*artists)})
+        self.assertEqual(json.loads(response.content.decode('utf-8')), ['OK'] * 50)
+        self.assertEqual(len([query for query in queries.captured_queries if table in query['sql']]), 2)
+        self.assertEqual(Concert.objects.count(), 50)
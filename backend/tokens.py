@@ -0,0 +1,110 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from django.db.models import F
+
+from .models import Profile
+
+_TOKEN_SALT = 'backend.tokens'
+
+# Version of users that are deleted or disabled, which no token carries
+_REVOKED = -1
+
+
+def _cache():
+    return caches[getattr(settings, 'FESTPAL_TOKEN_CACHE', 'default')]
+
+
+def _version_key(user_id):
+    return 'festpal:token-version:{0}'.format(user_id)
+
+
+def _version_ttl():
+    return getattr(settings, 'FESTPAL_TOKEN_VERSION_TTL', 5)
+
+
+def _load_version(user_id):
+    rows = list(User.objects.filter(pk=user_id, is_active=True).values_list('profile__token_version', flat=True))
+    if not rows:
+        return _REVOKED
+    return rows[0] or 0
+
+
+def token_version(user_id):
+    """
+    Read the revocation version of a user's tokens from the cache, or from the database on a miss
+    :param user_id: primary key of the user
+    :return: version, tokens carrying another version are revoked
+    """
+    version = _cache().get(_version_key(user_id))
+    if version is None:
+        version = _load_version(user_id)
+        # add() rather than set(), not to overwrite the version written by a revoke_tokens() running meanwhile
+        _cache().add(_version_key(user_id), version, _version_ttl())
+    return version
+
+
+def issue_token(user):
+    """
+    Issue a signed access token carrying the user's id, name, permissions and expiry.
+    The permissions are those of the user when the token is issued
+    :param user: authenticated User
+    :return: (token, expiry as a UNIX timestamp)
+    """
+    expires = int(time.time()) + getattr(settings, 'FESTPAL_TOKEN_LIFETIME', 86400)
+    payload = {'uid': user.pk,
+               'name': user.username,
+               'perms': sorted(user.get_all_permissions()),
+               'ver': token_version(user.pk),
+               'exp': expires}
+    return signing.dumps(payload, salt=_TOKEN_SALT, compress=True), expires
+
+
+def user_from_token(token):
+    """
+    Check an access token issued by issue_token(), without querying the database for the user
+    :param token: token string
+    :return: User built from the token, with the permissions it carries, or None if the token is not valid
+    """
+    try:
+        payload = signing.loads(token, salt=_TOKEN_SALT)
+        user_id, username, permissions, version, expires = (payload['uid'], payload['name'], payload['perms'],
+                                                            payload['ver'], payload['exp'])
+    except (signing.BadSignature, ValueError, KeyError, TypeError):
+        return None
+    if expires < time.time() or version != token_version(user_id):
+        return None
+    user = User(pk=user_id, username=username)
+    user._state.adding = False
+    user._state.db = 'default'
+    # Read by ModelBackend instead of querying the permissions
+    user._perm_cache = set(permissions)
+    return user
+
+
+def revoke_tokens(user_id):
+    """
+    Revoke all the tokens issued to a user so far
+    :param user_id: primary key of the user
+    """
+    if User.objects.filter(pk=user_id).exists():
+        Profile.objects.get_or_create(user_id=user_id)
+        Profile.objects.filter(user_id=user_id).update(token_version=F('token_version') + 1)
+    _cache().set(_version_key(user_id), _load_version(user_id), _version_ttl())
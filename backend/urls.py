@@ -8,14 +8,20 @@ urlpatterns = [
     url(r'^login/$', views.log_in, name='log_in'),
     url(r'^logout/$', views.log_out, name='log_out'),
     url(r'^mult/fest/$', views.read_multiple_festivals, name='read_multiple_festivals'),
+    url(r'^top/$', views.read_leaderboard, name='read_leaderboard'),
     url(r'^mult/conc/$', views.read_festival_concerts, name='read_festival_concerts'),
     url(r'^r/fest/$', views.read_festival_info, name='read_festival_info'),
+    url(r'^r/fest/batch/$', views.read_festivals_batch, name='read_festivals_batch'),
+    url(r'^r/bundle/$', views.read_festival_bundle, name='read_festival_bundle'),
     url(r'^w/fest/$', views.write_festival_info, name='write_festival_info'),
     url(r'^u/fest/$', views.update_festival_info, name='update_festival_info'),
     url(r'^d/fest/$', views.delete_festival, name='delete_festival'),
     url(r'^r/conc/$', views.read_concert_info, name='read_concert_info'),
+    url(r'^r/conc/batch/$', views.read_concerts_batch, name='read_concerts_batch'),
     url(r'^w/conc/$', views.write_concert_info, name='write_concert_info'),
+    url(r'^w/conc/bulk/$', views.write_concerts_bulk, name='write_concerts_bulk'),
     url(r'^u/conc/$', views.update_concert_info, name='update_concert_info'),
     url(r'^d/conc/$', views.delete_concert, name='delete_concert'),
     url(r'^v/$', views.vote, name='vote'),
+    url(r'^sync/$', views.sync, name='sync'),
 ]
@@ -0,0 +1,81 @@
+# Copyright 2015 Ivan Bratoev
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from django.utils import timezone
+
+from .models import Festival
+
+FESTIVAL_TEXT_FIELDS = ('description', 'country', 'city', 'address', 'genre', 'prices')
+
+
+def _parse_timestamp(value):
+    try:
+        moment = timezone.datetime.utcfromtimestamp(float(value))
+        return timezone.make_aware(moment)
+    except (ValueError, TypeError, OverflowError, OSError):
+        return None
+
+
+def _valid_text(value, field):
+    return isinstance(value, str) and len(value) <= Festival._meta.get_field(field).max_length
+
+
+def clean_festival(data):
+    """
+    Validate the fields of a festival the way write_festival_info() does, apart from
+    the uniqueness of the name, which needs the database
+    :param data: dictionary (or QueryDict) with the festival's name and optionally its other fields
+    :return: dictionary of values to create the Festival with, or None if the input is incorrect
+    """
+    if 'name' not in data.keys() or not _valid_text(data['name'], 'name'):
+        return None
+    values = {'name': data['name']}
+
+    for field in FESTIVAL_TEXT_FIELDS:
+        if field in data.keys():
+            if not _valid_text(data[field], field):
+                return None
+            values[field] = data[field]
+
+    if 'official' in data.keys() and bool(data['official']):
+        values['official'] = True
+    return values
+
+
+def clean_concert(data):
+    """
+    Validate the fields of a concert the way write_concert_info() does, apart from
+    the festival and the uniqueness of the artist, which need the database
+    :param data: dictionary (or QueryDict) with the concert's artist, start, end, and optionally stage and day
+    :return: dictionary of values to create the Concert with, or None if the input is incorrect
+    """
+    if 'artist' not in data.keys():
+        return None
+    if not isinstance(data['artist'], str) or len(data['artist']) > 255:
+        return None
+    values = {'artist': data['artist']}
+
+    for field in ('stage', 'day'):
+        if field in data.keys():
+            if not str(data[field]).isdigit():
+                return None
+            values[field] = int(data[field])
+
+    for field in ('start', 'end'):
+        if field not in data.keys():
+            return None
+        values[field] = _parse_timestamp(data[field])
+        if values[field] is None:
+            return None
+    return values
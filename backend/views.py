@@ -14,14 +14,30 @@
 
 import json
 import re
+from collections import OrderedDict
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.db import transaction, IntegrityError
+from django.db.models import F, Prefetch
 from django.utils import timezone
 
-from .models import Festival, Concert, client_has_permission, Profile
+from .buffers import vote_buffer, download_buffer
+from .conditional import festival_validators, lineup_validators, concert_validators
+from .filters import filter_festivals
+from .models import Festival, Concert, client_has_permission, Profile, InvalidInputOrDifferentCurrencyError
+from .pagination import paginate, next_cursor, iterate_in_chunks, InvalidCursorError
+from .pagination import paginate_search, next_search_cursor
+from .response_cache import get_response, store_response, store_streamed_response, invalidate_festival
+from .serializers import festivals_for_serialization, festival_to_dict, FESTIVAL_FIELDS
+from .serializers import concerts_for_serialization, concert_to_dict, lineup_to_dict, CONCERT_FIELDS
+from .serializers import stream_json_list, parse_fields, InvalidFieldsError
+from .sync import parse_sync_token, stream_changes
+from .tokens import issue_token, revoke_tokens
+from .validation import clean_festival, clean_concert
 
 
 # noinspection PyUnusedLocal
@@ -121,11 +137,17 @@ def log_in(request):
         return HttpResponse('Invalid login')
     if not user.is_active:
         return HttpResponse('Disabled account')
+    if request.POST.get('token'):
+        # Stateless access: no session is created, the client sends the token with each request
+        token, expires = issue_token(user)
+        return HttpResponse(json.dumps({'token': token, 'expires': expires}), content_type='application/json')
     login(request, user)
     return HttpResponse("OK")
 
 
 def log_out(request):
+    if getattr(request, 'auth_token', False):
+        revoke_tokens(request.user.pk)
     logout(request)
     return HttpResponse('Logged out')
 
@@ -143,58 +165,73 @@ def read_multiple_festivals(request):
     if 'num' not in request.POST.keys():
         return HttpResponse(json.dumps(data), content_type='application/json')
 
-    counter = int(request.POST['num'])
-
-    for festival in Festival.objects.all():
-        if counter == 0:
-            break
-        counter -= 1
-        if 'official' in request.POST.keys():
-            if bool(request.POST['official']) != festival.official:
-                continue
-        if 'name' in request.POST.keys():
-            if request.POST['name'] not in festival.name:
-                continue
-        if 'country' in request.POST.keys():
-            if request.POST['country'] not in festival.country:
-                continue
-        if 'city' in request.POST.keys():
-            if request.POST['city'] not in festival.city:
-                continue
-        if 'genre' in request.POST.keys():
-            if request.POST['genre'] not in festival.genre:
-                continue
-        if 'min_price' in request.POST.keys():
-            if 'max_price' in request.POST.keys():
-                if not festival.price_is_in_range(request.POST['min_price'], request.POST['max_price']):
-                    continue
-            else:
-                if not festival.price_is_in_range(request.POST['min_price']):
-                    continue
+    if not request.POST['num'].isdigit():
+        return HttpResponse('Incorrect input')
+    num = int(request.POST['num'])
+
+    order = request.POST.get('order', 'id')
+    try:
+        fields = parse_fields(request.POST.get('fields'), FESTIVAL_FIELDS)
+        festivals = filter_festivals(Festival.objects.all(), request.POST)
+        if 'search' in request.POST.keys() and 'order' not in request.POST.keys():
+            order = None
+            festivals, offset = paginate_search(festivals, request.POST['search'], request.POST.get('cursor'))
+            cursor = next_search_cursor(festivals, request.POST['search'], offset, num)
         else:
-            if 'max_price' in request.POST.keys():
-                if not festival.price_is_in_range(max_price=request.POST['max_price']):
-                    continue
-        if 'artist' in request.POST.keys():
-            artist_results = [concert for concert in festival.concert_set.all() if request.POST['artist'] in
-                              concert.artist]
-            if not artist_results:
-                continue
-
-        data.append({'id': festival.pk,
-                     'name': festival.name,
-                     'description': festival.description,
-                     'country': festival.country,
-                     'city': festival.city,
-                     'address': festival.address,
-                     'genre': festival.genre,
-                     'prices': festival.prices,
-                     'uploader': festival.owner.username,
-                     'official': festival.official,
-                     'downloads': festival.downloads.count(),
-                     'votes': festival.voters.count(),
-                     'first_uploaded': str(festival.first_uploaded),
-                     'last_modified': str(festival.last_modified)})
+            festivals = paginate(festivals, order, request.POST.get('cursor'))
+            cursor = next_cursor(festivals, order, num)
+    except (InvalidInputOrDifferentCurrencyError, InvalidCursorError, InvalidFieldsError):
+        return HttpResponse('Incorrect input')
+
+    if fields is not None and order is not None:
+        festivals = festivals_for_serialization(festivals, fields + [order.lstrip('-')])
+    else:
+        festivals = festivals_for_serialization(festivals, fields)
+    if order is None:
+        page = festivals[offset:offset + num].iterator()
+    else:
+        page = iterate_in_chunks(festivals, order, num)
+
+    response = StreamingHttpResponse(stream_json_list(page, lambda festival: festival_to_dict(festival, fields)),
+                                     content_type='application/json')
+    if cursor is not None:
+        response['X-Next-Cursor'] = cursor
+    return response
+
+
+# Rankings of the leaderboard, by the counter column they are read from
+LEADERBOARDS = {'votes': 'vote_count', 'downloads': 'download_count'}
+
+
+@login_required(redirect_field_name='', login_url='/backend/login/')
+def read_leaderboard(request):
+    if 'client' not in request.POST.keys():
+        return HttpResponse('Client name not provided')
+
+    if not client_has_permission(request.POST['client'], 'read'):
+        return HttpResponse('Permission not granted')
+
+    ranking = request.POST.get('by', 'votes')
+    if ranking not in LEADERBOARDS:
+        return HttpResponse('Incorrect input')
+
+    num = request.POST.get('num', '10')
+    if not num.isdigit() or int(num) > getattr(settings, 'FESTPAL_LEADERBOARD_SIZE', 100):
+        return HttpResponse('Incorrect input')
+
+    try:
+        fields = parse_fields(request.POST.get('fields'), FESTIVAL_FIELDS)
+    except InvalidFieldsError:
+        return HttpResponse('Incorrect input')
+
+    # The counters are kept up to date as votes and downloads are written, and each ranking
+    # is read in order from an index, so the top N festivals cost N index entries and no aggregation
+    festivals = Festival.objects.all()
+    for field in ('country', 'genre'):
+        if field in request.POST.keys():
+            festivals = festivals.filter(**{field: request.POST[field]})
+    festivals = festivals.order_by('-' + LEADERBOARDS[ranking], '-pk')[:int(num)]
+    data = [festival_to_dict(festival, fields) for festival in festivals_for_serialization(festivals, fields)]
     return HttpResponse(json.dumps(data), content_type='application/json')
 
 
@@ -206,8 +243,6 @@ def read_festival_concerts(request):
     if not client_has_permission(request.POST['client'], 'read'):
         return HttpResponse('Permission not granted')
 
-    data = []
-
     if 'id' not in request.POST.keys():
         return HttpResponse('Invalid Festival ID')
 
@@ -218,20 +253,41 @@ def read_festival_concerts(request):
         return HttpResponse('Invalid Festival ID')
 
     try:
-        festival = Festival.objects.get(pk=request.POST['id'])
-    except (KeyError, Festival.DoesNotExist):
+        fields = parse_fields(request.POST.get('fields'), CONCERT_FIELDS)
+    except InvalidFieldsError:
+        return HttpResponse('Incorrect input')
+
+    validators = lineup_validators(int(request.POST['id']), request.POST.get('fields'))
+    if validators is None:
         return HttpResponse('Invalid Festival ID')
-    for concert in festival.concert_set.all():
-        data.append({'festival': festival.pk,
-                     'artist': concert.artist,
-                     'stage': concert.stage,
-                     'day': concert.day,
-                     'start': str(concert.start),
-                     'end': str(concert.end),
-                     'first_uploaded': str(concert.first_uploaded),
-                     'last_modified': str(concert.last_modified)
-                     })
-    return HttpResponse(json.dumps(data), content_type='application/json')
+    if validators.not_modified(request):
+        return validators.not_modified_response()
+    # Counted only when the lineup is sent, not when the client's copy is still current
+    download_buffer.add(request.POST['id'], request.user.pk)
+
+    body = get_response('lineup', int(request.POST['id']), validators)
+    if body is not None:
+        return validators.apply(HttpResponse(body, content_type='application/json'))
+
+    concerts = Concert.objects.filter(festival=int(request.POST['id']))
+    concerts = iterate_in_chunks(concerts_for_serialization(paginate(concerts), fields))
+    chunks = stream_json_list(concerts, lambda concert: concert_to_dict(concert, fields))
+    response = StreamingHttpResponse(store_streamed_response('lineup', int(request.POST['id']), validators, chunks),
+                                     content_type='application/json')
+    return validators.apply(response)
+
+
+def _festival_info(festival, fields):
+    """
+    Serialize a festival the way read_festival_info() returns it, with its number of votes under 'voters'
+    :param festival: Festival object from festivals_for_serialization()
+    :param fields: list of fields to include, None for all of them
+    :return: dictionary ready to be dumped as JSON
+    """
+    data = festival_to_dict(festival, fields)
+    if 'votes' in data:
+        data['voters'] = data.pop('votes')
+    return data
 
 
 @login_required(redirect_field_name='', login_url='/backend/login/')
@@ -252,84 +308,121 @@ def read_festival_info(request):
         return HttpResponse('Invalid Festival ID')
 
     try:
-        festival = Festival.objects.get(pk=request.POST['id'])
-    except (KeyError, Festival.DoesNotExist):
+        fields = parse_fields(request.POST.get('fields'), FESTIVAL_FIELDS, {'voters': 'votes'})
+    except InvalidFieldsError:
+        return HttpResponse('Incorrect input')
+
+    validators = festival_validators(int(request.POST['id']), request.POST.get('fields'))
+    if validators is None:
         return HttpResponse('Invalid Festival ID')
-    data = dict(id=festival.pk,
-                name=festival.name,
-                description=festival.description,
-                country=festival.country,
-                city=festival.city,
-                address=festival.address,
-                genre=festival.genre,
-                prices=festival.prices,
-                uploader=festival.owner.username,
-                official=festival.official,
-                downloads=festival.downloads.count(),
-                voters=festival.voters.count(),
-                first_uploaded=str(festival.first_uploaded),
-                last_modified=str(festival.last_modified)
-                )
+    if validators.not_modified(request):
+        return validators.not_modified_response()
 
-    return HttpResponse(json.dumps(data), content_type='application/json')
+    body = get_response('festival', int(request.POST['id']), validators)
+    if body is None:
+        try:
+            festival = festivals_for_serialization(fields=fields).get(pk=request.POST['id'])
+        except (KeyError, Festival.DoesNotExist):
+            return HttpResponse('Invalid Festival ID')
+        body = json.dumps(_festival_info(festival, fields))
+        store_response('festival', int(request.POST['id']), validators, body)
+
+    download_buffer.add(request.POST['id'], request.user.pk)
+    return validators.apply(HttpResponse(body, content_type='application/json'))
 
 
 @login_required(redirect_field_name='', login_url='/backend/login/')
-def write_festival_info(request):
+def read_festival_bundle(request):
     if 'client' not in request.POST.keys():
         return HttpResponse('Client name not provided')
 
-    if not client_has_permission(request.POST['client'], 'write'):
+    if not client_has_permission(request.POST['client'], 'read'):
+        return HttpResponse('Permission not granted')
+
+    if 'id' not in request.POST.keys():
+        return HttpResponse('Invalid Festival ID')
+
+    if not request.POST['id'].isdigit():
+        return HttpResponse('Invalid Festival ID')
+
+    validators = lineup_validators(int(request.POST['id']), 'bundle', downloads=True)
+    if validators is None:
+        return HttpResponse('Invalid Festival ID')
+    if validators.not_modified(request):
+        return validators.not_modified_response()
+
+    lineup = Prefetch('concert_set', queryset=Concert.objects.order_by('day', 'stage', 'start', 'pk'))
+    try:
+        festival = festivals_for_serialization().prefetch_related(lineup).get(pk=request.POST['id'])
+    except Festival.DoesNotExist:
+        return HttpResponse('Invalid Festival ID')
+    data = festival_to_dict(festival)
+    data['lineup'] = lineup_to_dict(festival.concert_set.all())
+
+    download_buffer.add(request.POST['id'], request.user.pk)
+    return validators.apply(HttpResponse(json.dumps(data), content_type='application/json'))
+
+
+def _parse_batch_ids(value):
+    """
+    Parse the ids parameter of a batch read
+    :param value: comma separated list of IDs
+    :return: list of unique IDs in the order given, or None if the list is invalid or too long
+    """
+    ids = []
+    for id_str in value.split(','):
+        id_str = id_str.strip()
+        if not id_str.isdigit():
+            return None
+        if int(id_str) not in ids:
+            ids.append(int(id_str))
+            if len(ids) > getattr(settings, 'FESTPAL_MAX_BATCH_SIZE', 100):
+                return None
+    return ids
+
+
+@login_required(redirect_field_name='', login_url='/backend/login/')
+def read_festivals_batch(request):
+    if 'client' not in request.POST.keys():
+        return HttpResponse('Client name not provided')
+
+    if not client_has_permission(request.POST['client'], 'read'):
         return HttpResponse('Permission not granted')
 
-    if 'name' not in request.POST.keys():
+    if 'ids' not in request.POST.keys():
         return HttpResponse('Incorrect input')
-    if len(request.POST['name']) > 255:
+    ids = _parse_batch_ids(request.POST['ids'])
+    if ids is None:
         return HttpResponse('Incorrect input')
-    if Festival.objects.filter(name=request.POST['name']).count() != 0:
-        return HttpResponse('Name exists')
 
-    if 'description' in request.POST.keys():
-        if len(request.POST['description']) > 800:
-            return HttpResponse('Incorrect input')
+    try:
+        fields = parse_fields(request.POST.get('fields'), FESTIVAL_FIELDS, {'voters': 'votes'})
+    except InvalidFieldsError:
+        return HttpResponse('Incorrect input')
 
-    if 'country' in request.POST.keys():
-        if len(request.POST['country']) > 50:
-            return HttpResponse('Incorrect input')
+    festivals = festivals_for_serialization(fields=fields).in_bulk(ids)
+    data = OrderedDict()
+    for pk in ids:
+        data[str(pk)] = _festival_info(festivals[pk], fields) if pk in festivals else None
+    return HttpResponse(json.dumps(data), content_type='application/json')
 
-    if 'city' in request.POST.keys():
-        if len(request.POST['city']) > 90:
-            return HttpResponse('Incorrect input')
 
-    if 'address' in request.POST.keys():
-        if len(request.POST['address']) > 200:
-            return HttpResponse('Incorrect input')
+@login_required(redirect_field_name='', login_url='/backend/login/')
+def write_festival_info(request):
+    if 'client' not in request.POST.keys():
+        return HttpResponse('Client name not provided')
 
-    if 'genre' in request.POST.keys():
-        if len(request.POST['genre']) > 100:
-            return HttpResponse('Incorrect input')
+    if not client_has_permission(request.POST['client'], 'write'):
+        return HttpResponse('Permission not granted')
 
-    if 'prices' in request.POST.keys():
-        if len(request.POST['prices']) > 400:
-            return HttpResponse('Incorrect input')
+    values = clean_festival(request.POST)
+    if values is None:
+        return HttpResponse('Incorrect input')
 
-    festival = Festival(name=request.POST['name'],
-                        owner=request.user)
-    if 'description' in request.POST.keys():
-        festival.description = request.POST['description']
-    if 'country' in request.POST.keys():
-        festival.description = request.POST['country']
-    if 'city' in request.POST.keys():
-        festival.description = request.POST['city']
-    if 'address' in request.POST.keys():
-        festival.description = request.POST['address']
-    if 'genre' in request.POST.keys():
-        festival.description = request.POST['genre']
-    if 'prices' in request.POST.keys():
-        festival.description = request.POST['prices']
-    if 'official' in request.POST.keys():
-        if bool(request.POST['official']):
-            festival.official = True
+    if Festival.objects.filter(name=values['name']).exists():
+        return HttpResponse('Name exists')
+
+    festival = Festival(owner=request.user, **values)
     festival.save()
     return HttpResponse("OK")
 
@@ -357,6 +450,7 @@ def update_festival_info(request):
     if request.user != festival.owner:
         return HttpResponse('Permission not granted')
     result = ''
+    updated = []
     max_lengths = dict(name=255, description=800, country=50,
                        city=90, address=200, genre=100, prices=400)
     for key in request.POST.keys():
@@ -365,13 +459,29 @@ def update_festival_info(request):
         if len(request.POST[key]) > max_lengths[key]:
             return HttpResponse('Incorrect input')
         setattr(festival, key, request.POST[key])
+        updated.append(key)
         result += '{0}:{1}\n'.format(key, request.POST[key])
     if result != '':
-        festival.save()
+        # Only the edited fields: the counters loaded above may be stale by now, see Festival.COUNTERS
+        festival.save(update_fields=updated + ['last_modified'])
+        invalidate_festival(festival.pk)
 
     return HttpResponse(result)
 
 
+def _concert_info(concert, fields):
+    """
+    Serialize a concert the way read_concert_info() returns it, with its stage under 'scene'
+    :param concert: Concert object from concerts_for_serialization()
+    :param fields: list of fields to include, None for all of them
+    :return: dictionary ready to be dumped as JSON
+    """
+    data = concert_to_dict(concert, fields)
+    if 'stage' in data:
+        data['scene'] = data.pop('stage')
+    return data
+
+
 @login_required(redirect_field_name='', login_url='/backend/login/')
 def read_concert_info(request):
     if 'client' not in request.POST.keys():
@@ -386,20 +496,52 @@ def read_concert_info(request):
         return HttpResponse(json.dumps(data), content_type='application/json')
 
     try:
-        concert = Concert.objects.get(pk=request.POST['id'])
+        fields = parse_fields(request.POST.get('fields'), CONCERT_FIELDS, {'scene': 'stage'})
+    except InvalidFieldsError:
+        return HttpResponse('Incorrect input')
+
+    if not request.POST['id'].isdigit():
+        return HttpResponse(json.dumps(data), content_type='application/json')
+
+    validators = concert_validators(int(request.POST['id']), request.POST.get('fields'))
+    if validators is None:
+        return HttpResponse(json.dumps(data), content_type='application/json')
+    if validators.not_modified(request):
+        return validators.not_modified_response()
+
+    try:
+        concert = concerts_for_serialization(fields=fields).get(pk=request.POST['id'])
     except (KeyError, Concert.DoesNotExist):
         return HttpResponse(json.dumps(data), content_type='application/json')
 
-    data = dict(festival=concert.festival.pk,
-                artist=concert.artist,
-                scene=concert.stage,
-                day=concert.day,
-                start=str(concert.start),
-                end=str(concert.end),
-                first_uploaded=str(concert.first_uploaded),
-                last_modified=str(concert.last_modified)
-                )
+    data = _concert_info(concert, fields)
+
+    return validators.apply(HttpResponse(json.dumps(data), content_type='application/json'))
+
 
+@login_required(redirect_field_name='', login_url='/backend/login/')
+def read_concerts_batch(request):
+    if 'client' not in request.POST.keys():
+        return HttpResponse('Client name not provided')
+
+    if not client_has_permission(request.POST['client'], 'read'):
+        return HttpResponse('Permission not granted')
+
+    if 'ids' not in request.POST.keys():
+        return HttpResponse('Incorrect input')
+    ids = _parse_batch_ids(request.POST['ids'])
+    if ids is None:
+        return HttpResponse('Incorrect input')
+
+    try:
+        fields = parse_fields(request.POST.get('fields'), CONCERT_FIELDS, {'scene': 'stage'})
+    except InvalidFieldsError:
+        return HttpResponse('Incorrect input')
+
+    concerts = concerts_for_serialization(fields=fields).in_bulk(ids)
+    data = OrderedDict()
+    for pk in ids:
+        data[str(pk)] = _concert_info(concerts[pk], fields) if pk in concerts else None
     return HttpResponse(json.dumps(data), content_type='application/json')
 
 
@@ -414,57 +556,70 @@ def write_concert_info(request):
     if 'festival' not in request.POST.keys():
         return HttpResponse('Incorrect input')
 
-    if not Festival.objects.filter(pk=int(request.POST['festival'])):
+    if not request.POST['festival'].isdigit() or not Festival.objects.filter(pk=request.POST['festival']).exists():
         return HttpResponse('Incorrect input')
 
-    if 'artist' not in request.POST.keys():
+    values = clean_concert(request.POST)
+    if values is None:
         return HttpResponse('Incorrect input')
-    if len(request.POST['artist']) > 255:
-        return HttpResponse('Incorrect input')
-    if Concert.objects.filter(artist=request.POST['artist']).count() != 0:
+
+    if Concert.objects.filter(artist=values['artist']).exists():
         return HttpResponse('Artist exists')
 
-    if 'stage' in request.POST.keys():
-        if not request.POST['stage'].isdigit():
-            return HttpResponse('Incorrect input')
+    concert = Concert(festival_id=int(request.POST['festival']), **values)
+    concert.save()
+    invalidate_festival(concert.festival_id)
 
-    if 'day' in request.POST.keys():
-        if not request.POST['day'].isdigit():
-            return HttpResponse('Incorrect input')
+    return HttpResponse("OK")
 
-    if 'start' not in request.POST.keys():
-        return HttpResponse('Incorrect input')
 
-    if 'end' not in request.POST.keys():
+@login_required(redirect_field_name='', login_url='/backend/login/')
+def write_concerts_bulk(request):
+    if 'client' not in request.POST.keys():
+        return HttpResponse('Client name not provided')
+
+    if not client_has_permission(request.POST['client'], 'write'):
+        return HttpResponse('Permission not granted')
+
+    if 'festival' not in request.POST.keys() or 'concerts' not in request.POST.keys():
         return HttpResponse('Incorrect input')
 
-    try:
-        start = timezone.datetime.utcfromtimestamp(float(request.POST['start']))
-        start = timezone.make_aware(start)
-    except ValueError or OverflowError or OSError:
+    if not request.POST['festival'].isdigit() or not Festival.objects.filter(pk=request.POST['festival']).exists():
         return HttpResponse('Incorrect input')
 
     try:
-        end = timezone.datetime.utcfromtimestamp(float(request.POST['end']))
-        end = timezone.make_aware(end)
-    except ValueError or OverflowError or OSError:
+        items = json.loads(request.POST['concerts'])
+    except ValueError:
+        return HttpResponse('Incorrect input')
+    if not isinstance(items, list) or len(items) > getattr(settings, 'FESTPAL_MAX_BULK_SIZE', 1000):
         return HttpResponse('Incorrect input')
 
-    festival = Festival.objects.get(pk=request.POST['festival'])
-
-    concert = Concert(festival=festival,
-                      artist=request.POST['artist'],
-                      start=start,
-                      end=end)
-    if 'stage' in request.POST.keys():
-        concert.stage = request.POST['stage']
-
-    if 'day' in request.POST.keys():
-        concert.day = request.POST['day']
-
-    concert.save()
+    # Validate every item before touching the database, so that nothing is written unless all of them are correct
+    values = [clean_concert(item) if isinstance(item, dict) else None for item in items]
+    results = ['Incorrect input' if item is None else 'OK' for item in values]
+    artists = [item['artist'] for item in values if item is not None]
+    existing = set(Concert.objects.filter(artist__in=artists).values_list('artist', flat=True)) if artists else set()
+    seen = set()
+    for index, item in enumerate(values):
+        if item is None:
+            continue
+        if item['artist'] in existing or item['artist'] in seen:
+            results[index] = 'Artist exists'
+        seen.add(item['artist'])
+
+    if any(result != 'OK' for result in results):
+        results = [result if result != 'OK' else 'Not inserted' for result in results]
+    else:
+        festival_id = int(request.POST['festival'])
+        try:
+            with transaction.atomic():
+                Concert.objects.bulk_create([Concert(festival_id=festival_id, **item) for item in values])
+            invalidate_festival(festival_id)
+        except IntegrityError:
+            # Another upload inserted some of the artists since they were checked
+            results = ['Not inserted'] * len(values)
 
-    return HttpResponse("OK")
+    return HttpResponse(json.dumps(results), content_type='application/json')
 
 
 @login_required(redirect_field_name='', login_url='/backend/login/')
@@ -521,6 +676,7 @@ def update_concert_info(request):
             return HttpResponse('Incorrect input')
     if result != '':
         concert.save()
+        invalidate_festival(concert.festival_id)
     return HttpResponse(result)
 
 
@@ -547,6 +703,7 @@ def delete_festival(request):
     if request.user != festival.owner:
         return HttpResponse('Permission not granted')
     festival.delete()
+    invalidate_festival(request.POST['id'])
     return HttpResponse('OK')
 
 
@@ -568,6 +725,7 @@ def delete_concert(request):
     if request.user != concert.festival.owner:
         return HttpResponse('Permission not granted')
     concert.delete()
+    invalidate_festival(concert.festival_id)
     return HttpResponse('OK')
 
 
@@ -587,10 +745,42 @@ def vote(request):
     if not request.POST['id'].isdigit():
         return HttpResponse('Invalid Festival ID')
 
+    festivals = Festival.objects.filter(pk=request.POST['id'])
+    vote_count = list(festivals.values_list('vote_count', flat=True))
+    if not vote_count:
+        return HttpResponse('Invalid Festival ID')
+    if getattr(settings, 'FESTPAL_VOTE_BUFFER', False):
+        # Written by the next flush of the buffer; until then the count returned does not include it
+        vote_buffer.add(request.POST['id'], request.user.pk)
+        return HttpResponse(str(vote_count[0]))
     try:
-        festival = Festival.objects.get(pk=request.POST['id'])
-    except (KeyError, Festival.DoesNotExist):
+        with transaction.atomic():
+            Festival.voters.through.objects.create(festival_id=request.POST['id'], user_id=request.user.pk)
+            # Counted only when the vote is new, without rewriting the rest of the row
+            festivals.update(vote_count=F('vote_count') + 1, last_modified=timezone.now())
+        invalidate_festival(request.POST['id'])
+    except IntegrityError:
+        # The user has voted for the festival already
+        pass
+    vote_count = list(festivals.values_list('vote_count', flat=True))
+    if not vote_count:
+        # Deleted in the meantime
         return HttpResponse('Invalid Festival ID')
-    festival.voters.add(request.user)
-    festival.save()
-    return HttpResponse(str(festival.voters_number()))
+    return HttpResponse(str(vote_count[0]))
+
+
+@login_required(redirect_field_name='', login_url='/backend/login/')
+def sync(request):
+    if 'client' not in request.POST.keys():
+        return HttpResponse('Client name not provided')
+
+    if not client_has_permission(request.POST['client'], 'read'):
+        return HttpResponse('Permission not granted')
+
+    since = None
+    if 'since' in request.POST.keys():
+        since = parse_sync_token(request.POST['since'])
+        if since is None:
+            return HttpResponse('Incorrect input')
+
+    return StreamingHttpResponse(stream_changes(since), content_type='application/json')